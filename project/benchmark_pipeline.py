@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import math
+import shutil
+import argparse
+import tempfile
+import zipfile
+import io
+import time
+import subprocess
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+# Benchmarks every ETL stage on synthetic data with the real source column schema.
+# Runs offline: a fake kaggle executable serves the generated zip files.
+
+script_directory = os.path.dirname(os.path.abspath(__file__))
+parent_directory = os.path.dirname(script_directory)
+
+benchmark_years = list(range(1973, 2023))
+educations = ["less_than_hs", "high_school", "some_college", "bachelors_degree", "advanced_degree"]
+age_bands = ["16-24", "25-54", "55-64", "65+"]
+demographic_prefixes = ["", "men_", "women_", "white_", "black_", "hispanic_",
+                        "white_men_", "white_women_", "black_men_", "black_women_", "hispanic_men_", "hispanic_women_"]
+
+wages_source_columns = [prefix + education for prefix in demographic_prefixes for education in educations]
+employment_source_columns = ["total_population"] + [
+    col for prefix in demographic_prefixes
+    for col in [prefix.rstrip("_") or "all"] + [prefix + age for age in age_bands] + [prefix + education for education in educations]
+]
+
+# Fake kaggle executable: serves <slug>.zip from FAKE_KAGGLE_SOURCE after FAKE_KAGGLE_DELAY seconds
+FAKE_KAGGLE_SCRIPT = """#!{python}
+import os, sys, time, shutil
+args = sys.argv[1:]
+if args[1] == "files":
+    # metadata listing, changes whenever FAKE_KAGGLE_VERSION changes
+    print("name,size,creationDate")
+    print(args[-1].split("/")[1] + ".csv,1," + os.environ.get("FAKE_KAGGLE_VERSION", "1"))
+    sys.exit(0)
+dataset = args[args.index("-d") + 1]
+target = args[args.index("-p") + 1]
+time.sleep(float(os.environ.get("FAKE_KAGGLE_DELAY", "0")))
+shutil.copy(os.path.join(os.environ["FAKE_KAGGLE_SOURCE"], dataset.split("/")[1] + ".zip"), target)
+"""
+
+def write_fake_kaggle_executable(bin_directory):
+    kaggle_path = os.path.join(bin_directory, "kaggle")
+    with open(kaggle_path, "w") as f:
+        f.write(FAKE_KAGGLE_SCRIPT.format(python=sys.executable))
+    os.chmod(kaggle_path, 0o755)
+    return kaggle_path
+
+# -----------------SYNTHETIC DATA-----------------#
+
+def generate_synthetic_frame(kind, rows, seed = 0, missing_fraction = 0.01):
+    rng = np.random.default_rng(seed)
+    columns = wages_source_columns if kind == "wages" else employment_source_columns
+
+    # many regions x the real year range, so every (year, region) pair is unique
+    regions = max(1, math.ceil(rows / len(benchmark_years)))
+    years = np.tile(np.array(benchmark_years, dtype="int16"), regions)[:rows]
+    region_names = np.repeat(np.array([f"region_{i:06d}" for i in range(regions)]), len(benchmark_years))[:rows]
+
+    low, high = (5.0, 60.0) if kind == "wages" else (20.0, 90.0)
+    values = rng.uniform(low, high, size=(rows, len(columns))).round(2)
+    values[rng.random(size=values.shape) < missing_fraction] = np.nan
+
+    df = pd.DataFrame(values, columns=columns)
+    if kind == "employment":
+        df["total_population"] = rng.uniform(1e5, 3e5, size=rows).round(0)
+    df.insert(0, "region", region_names)
+    df.insert(0, "year", years)
+    return df
+
+def write_synthetic_zip(df, zip_path, member_name, chunk_rows = 100000):
+    # written in slices so 10^7 row frames don't need a second full copy as one csv string
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        with zip_ref.open(member_name, "w", force_zip64=True) as member:
+            with io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                for start in range(0, len(df), chunk_rows):
+                    df.iloc[start:start + chunk_rows].to_csv(text, index=False, header=(start == 0))
+    return zip_path
+
+def generate_synthetic_data_sets(rows, source_directory, seed = 0):
+    os.makedirs(source_directory, exist_ok=True)
+    zip_paths = []
+    for kind, dataset in zip(["wages", "employment"], pipeline.dataset_names):
+        zip_path = os.path.join(source_directory, dataset.split("/")[1] + ".zip")
+        write_synthetic_zip(generate_synthetic_frame(kind, rows, seed), zip_path, f"{kind}.csv")
+        zip_paths.append(zip_path)
+    return zip_paths
+
+# -----------------SYNTHETIC DATA-----------------#
+
+# -----------------BENCHMARKS-----------------#
+
+def run_benchmark(rows, work_directory, trace_memory = False):
+
+    source_directory = os.path.join(work_directory, "source")
+    bin_directory = os.path.join(work_directory, "bin")
+    data_directory = os.path.join(work_directory, "data")
+    for directory in [source_directory, bin_directory, data_directory]:
+        os.makedirs(directory, exist_ok=True)
+
+    print(f"Generating synthetic datasets with {rows} rows...")
+    generate_synthetic_data_sets(rows, source_directory)
+    write_fake_kaggle_executable(bin_directory)
+
+    run_report = pipeline.new_run_report(trace_memory)
+
+    previous_environment = {key: os.environ.get(key) for key in ["PATH", "FAKE_KAGGLE_SOURCE", "PIPELINE_KAGGLE_TRANSPORT"]}
+    os.environ["PATH"] = bin_directory + os.pathsep + os.environ.get("PATH", "")
+    os.environ["FAKE_KAGGLE_SOURCE"] = source_directory
+    os.environ["PIPELINE_KAGGLE_TRANSPORT"] = "cli"
+    try:
+        wages_data, employment_data = pipeline.run_stage(
+            run_report, "data_sets_extraction", pipeline.extract_data_sets, pipeline.dataset_names,
+            data_directory_path=data_directory, use_cache=False,
+            read_options=[pipeline.wages_ingestion_schema, pipeline.employment_ingestion_schema])
+    finally:
+        for key, value in previous_environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    transformed_wages = pipeline.run_stage(run_report, "transform_wages_data_set", pipeline.transform_wages_data_set, wages_data)
+    transformed_employment = pipeline.run_stage(run_report, "transform_employment_data_set", pipeline.transform_employment_data_set, employment_data)
+    merged = pipeline.run_stage(run_report, "merge_data_sets", pipeline.merge_data_sets, transformed_wages, transformed_employment)
+    final = pipeline.run_stage(run_report, "merged_data_set_transformation", pipeline.merged_data_set_transformation, merged)
+    pipeline.run_stage(run_report, "load_datasets", pipeline.load_datasets, final, db_path=os.path.join(data_directory, "benchmark.db"))
+
+    pipeline.finish_run_report(run_report, os.path.join(work_directory, "run_report.json"))
+
+    results = {}
+    for stage in run_report["stages"]:
+        processed_rows = max(stage["rows_in"], stage["rows_out"])
+        results[stage["stage"]] = {
+            "rows": processed_rows,
+            "wall_seconds": stage["wall_seconds"],
+            "rows_per_second": round(processed_rows / stage["wall_seconds"], 1) if stage["wall_seconds"] > 0 else None,
+            "peak_traced_bytes": stage["peak_traced_bytes"],
+            "memory_out_bytes": stage["memory_out_bytes"],
+        }
+    return results
+
+def run_benchmarks(sizes, trace_memory = False):
+    results = {}
+    for rows in sizes:
+        work_directory = tempfile.mkdtemp(prefix=f"pipeline_benchmark_{rows}_")
+        try:
+            results[str(rows)] = run_benchmark(rows, work_directory, trace_memory)
+        finally:
+            shutil.rmtree(work_directory, ignore_errors=True)
+    return results
+
+# -----------------STARTUP-----------------#
+
+# Startup timings are small, regressions below this many seconds are noise
+startup_slack_seconds = 0.05
+
+def measure_import_times(module = "pipeline"):
+    # `python -X importtime` in a fresh interpreter, cumulative microseconds per imported module
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=script_directory, capture_output=True, text=True, check=True)
+    import_times = {}
+    for line in completed.stderr.splitlines():
+        fields = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(fields) == 3 and fields[0].strip().isdigit():
+            import_times[fields[2].strip()] = int(fields[1])
+    return import_times
+
+def run_startup_benchmark():
+
+    # import cost of the pipeline module and wall time of `pipeline.py status`, neither should load pandas
+    import_times = measure_import_times("pipeline")
+    wall_start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(script_directory, "pipeline.py"), "status"], check=True, capture_output=True)
+    status_seconds = time.perf_counter() - wall_start
+
+    results = {
+        "import_pipeline": {"rows": 0, "wall_seconds": round(import_times["pipeline"] / 1e6, 4), "rows_per_second": None, "peak_traced_bytes": None},
+        "status_command": {"rows": 0, "wall_seconds": round(status_seconds, 4), "rows_per_second": None, "peak_traced_bytes": None},
+    }
+    return results, import_times
+
+def format_import_times(import_times, top = 10):
+    lines = [f"{'cumulative ms':>14} module"]
+    for name, microseconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"{microseconds / 1000:>14.1f} {name}")
+    return "\n".join(lines)
+
+# -----------------STARTUP-----------------#
+
+def compare_with_baseline(results, baseline, throughput_tolerance = 0.25, memory_tolerance = 0.25):
+    regressions = []
+    for size, stages in results.items():
+        for stage, measured in stages.items():
+            expected = baseline.get(size, {}).get(stage)
+            if expected is None:
+                continue
+            if measured["rows_per_second"] and expected.get("rows_per_second") and \
+                    measured["rows_per_second"] < expected["rows_per_second"] * (1 - throughput_tolerance):
+                regressions.append(f"{stage} @ {size} rows: {measured['rows_per_second']:.0f} rows/s, baseline {expected['rows_per_second']:.0f} rows/s")
+            if measured["peak_traced_bytes"] and expected.get("peak_traced_bytes") and \
+                    measured["peak_traced_bytes"] > expected["peak_traced_bytes"] * (1 + memory_tolerance):
+                regressions.append(f"{stage} @ {size} rows: peak {measured['peak_traced_bytes']} bytes, baseline {expected['peak_traced_bytes']} bytes")
+            # startup entries have no rows, their wall time is compared directly
+            if measured["rows_per_second"] is None and expected.get("wall_seconds") and \
+                    measured["wall_seconds"] > expected["wall_seconds"] * (1 + throughput_tolerance) + startup_slack_seconds:
+                regressions.append(f"{stage}: {measured['wall_seconds']:.3f} s, baseline {expected['wall_seconds']:.3f} s")
+    return regressions
+
+def format_benchmark_results(results):
+    lines = [f"{'rows':>10} {'stage':<32} {'wall s':>8} {'rows/s':>14} {'peak MB':>9} {'frame MB':>9}"]
+    for size, stages in results.items():
+        for stage, measured in stages.items():
+            peak = measured["peak_traced_bytes"]
+            lines.append(f"{size:>10} {stage:<32} {measured['wall_seconds']:>8.3f} "
+                         f"{(measured['rows_per_second'] or 0):>14.0f} {(peak or 0) / (1024 * 1024):>9.2f} "
+                         f"{measured.get('memory_out_bytes', 0) / (1024 * 1024):>9.2f}")
+    return "\n".join(lines)
+
+# -----------------BENCHMARKS-----------------#
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic scaled datasets")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+                        help="row counts per dataset, e.g. 1000 ... 10000000")
+    parser.add_argument("--baseline", default=os.path.join(parent_directory, "data", "benchmark_baseline.json"))
+    parser.add_argument("--output", default=os.path.join(parent_directory, "data", "benchmark_results.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput/memory regression (fraction)")
+    parser.add_argument("--trace-memory", action="store_true", help="also record peak traced memory (throughput is lower while tracing)")
+    parser.add_argument("--startup-only", action="store_true", help="only measure import time and the status command")
+    args = parser.parse_args()
+
+    # stages are measured with the same pandas settings as a pipeline run
+    pipeline.enable_copy_on_write()
+    results = {} if args.startup_only else run_benchmarks(args.sizes, trace_memory=args.trace_memory)
+    results["startup"], import_times = run_startup_benchmark()
+    print(format_benchmark_results(results))
+    print("\nSlowest imports of pipeline.py (python -X importtime):")
+    print(format_import_times(import_times))
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance, args.tolerance)
+        if regressions:
+            print("Performance regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+    else:
+        print(f"No baseline found at {args.baseline}, run with --save-baseline to create one.")
@@ -0,0 +1,662 @@
+import os
+import io
+import re
+import sys
+import zipfile
+import sqlite3
+import argparse
+import pandas as pd
+import numpy as np
+
+from pipeline import (
+    quote_identifier,
+    build_table_ddl,
+    insert_rows_chunked,
+    apply_bulk_load_pragmas,
+    restore_pragmas,
+)
+
+# Runs the Jayvee exercise pipelines (exercises/*.jv) with pandas, from local files only.
+# Blocks pass whole frames to each other, types and constraints are checked column-wise with boolean masks.
+
+# -----------------PARSER-----------------#
+
+token_pattern = re.compile(r"""
+    (?P<whitespace>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<operator>->|<=|>=|==|!=|[{}\[\]():;,<>+\-*/%])
+""", re.VERBOSE | re.DOTALL)
+
+def tokenize_jv(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        # a regex literal can only follow the matches keyword
+        if tokens and tokens[-1] == ("identifier", "matches") and text[position] == "/":
+            end = position + 1
+            in_class = False
+            while end < len(text) and (text[end] != "/" or in_class):
+                if text[end] == "\\":
+                    end += 1
+                elif text[end] in "[]":
+                    in_class = text[end] == "["
+                end += 1
+            tokens.append(("regex", text[position + 1:end]))
+            position = end + 1
+            continue
+
+        match = token_pattern.match(text, position)
+        if match is None:
+            line = text.count("\n", 0, position) + 1
+            sys.exit(f"Unexpected character {text[position]!r} on line {line} of the .jv file")
+        kind = match.lastgroup
+        if kind == "string":
+            tokens.append(("string", match.group()[1:-1]))
+        elif kind == "number":
+            tokens.append(("number", float(match.group()) if "." in match.group() else int(match.group())))
+        elif kind not in ["whitespace", "comment"]:
+            tokens.append((kind, match.group()))
+        position = match.end()
+    return tokens
+
+def token_stream(tokens):
+    return {"tokens": tokens, "position": 0}
+
+def peek_token(stream, offset = 0):
+    index = stream["position"] + offset
+    return stream["tokens"][index] if index < len(stream["tokens"]) else ("end", None)
+
+def take_token(stream, value = None):
+    token = peek_token(stream)
+    if value is not None and token[1] != value:
+        sys.exit(f"Expected {value!r} in the .jv file but found {token[1]!r}")
+    stream["position"] += 1
+    return token
+
+def accept_token(stream, value):
+    if peek_token(stream)[1] == value and peek_token(stream)[0] != "string":
+        stream["position"] += 1
+        return True
+    return False
+
+def column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+def parse_cell(reference):
+    # "A1" -> (column 0, row 0), "I" (used before *) -> (column 8, None)
+    match = re.fullmatch(r"([A-Za-z]+)(\d*)", reference)
+    if match is None:
+        sys.exit(f"Invalid cell reference {reference!r}")
+    return column_index(match.group(1)), int(match.group(2)) - 1 if match.group(2) else None
+
+def parse_range(tokens):
+    start_column, start_row = parse_cell(take_token(tokens)[1])
+    take_token(tokens, ":")
+    end_column, end_row = parse_cell(take_token(tokens)[1])
+    if accept_token(tokens, "*"):
+        end_row = None
+    return {"kind": "range", "start": (start_column, start_row), "end": (end_column, end_row)}
+
+def parse_value(tokens):
+    kind, value = peek_token(tokens)
+    if kind == "operator" and value == "[":
+        take_token(tokens)
+        items = []
+        while not accept_token(tokens, "]"):
+            items.append(parse_value(tokens))
+            accept_token(tokens, ",")
+        return items
+    if kind == "string":
+        take_token(tokens)
+        # "name" oftype type entries of TableInterpreter columns
+        if accept_token(tokens, "oftype"):
+            return {"kind": "column", "name": value, "type": take_token(tokens)[1]}
+        return value
+    if kind == "number":
+        take_token(tokens)
+        return value
+    if kind == "operator" and value == "-" and peek_token(tokens, 1)[0] == "number":
+        take_token(tokens)
+        return -take_token(tokens)[1]
+    if kind == "identifier":
+        take_token(tokens)
+        if value in ["true", "false"]:
+            return value == "true"
+        if value == "range":
+            return parse_range(tokens)
+        if value == "column":
+            return {"kind": "column_reference", "index": column_index(take_token(tokens)[1])}
+        if value == "row":
+            return {"kind": "row_reference", "index": take_token(tokens)[1] - 1}
+        if value == "cell":
+            column, row = parse_cell(take_token(tokens)[1])
+            return {"kind": "range", "start": (column, row), "end": (column, row)}
+        return {"kind": "reference", "name": value}
+    sys.exit(f"Unexpected value {value!r} in the .jv file")
+
+def parse_properties(tokens):
+    properties = {}
+    take_token(tokens, "{")
+    while not accept_token(tokens, "}"):
+        name = take_token(tokens)[1]
+        take_token(tokens, ":")
+        properties[name] = parse_value(tokens)
+        accept_token(tokens, ";")
+    return properties
+
+def parse_expression_tokens(tokens):
+    expression = []
+    while peek_token(tokens)[1] != ";":
+        if peek_token(tokens)[0] == "end":
+            sys.exit("Unterminated expression in the .jv file")
+        expression.append(take_token(tokens))
+    take_token(tokens, ";")
+    return expression
+
+def parse_transform(tokens):
+    transform = {"inputs": [], "output": None, "expression": None}
+    take_token(tokens, "{")
+    while not accept_token(tokens, "}"):
+        if accept_token(tokens, "from"):
+            name = take_token(tokens)[1]
+            take_token(tokens, "oftype")
+            transform["inputs"].append({"name": name, "type": take_token(tokens)[1]})
+            take_token(tokens, ";")
+        elif accept_token(tokens, "to"):
+            name = take_token(tokens)[1]
+            take_token(tokens, "oftype")
+            transform["output"] = {"name": name, "type": take_token(tokens)[1]}
+            take_token(tokens, ";")
+        else:
+            take_token(tokens)
+            take_token(tokens, ":")
+            transform["expression"] = parse_expression_tokens(tokens)
+    return transform
+
+def parse_definitions(tokens, model, until = None):
+    while peek_token(tokens)[0] != "end" and peek_token(tokens)[1] != until:
+        keyword = take_token(tokens)[1]
+        if keyword == "pipeline":
+            name = take_token(tokens)[1]
+            take_token(tokens, "{")
+            pipeline = {"name": name, "blocks": {}, "pipes": []}
+            model["pipelines"].append(pipeline)
+            parse_definitions(tokens, model, until="}")
+            take_token(tokens, "}")
+            pipeline["blocks"], model["blocks"] = model["blocks"], {}
+            pipeline["pipes"], model["pipes"] = model["pipes"], []
+        elif keyword == "block":
+            name = take_token(tokens)[1]
+            take_token(tokens, "oftype")
+            model["blocks"][name] = {"name": name, "type": take_token(tokens)[1], "properties": parse_properties(tokens)}
+        elif keyword == "valuetype":
+            name = take_token(tokens)[1]
+            take_token(tokens, "oftype")
+            base = take_token(tokens)[1]
+            properties = parse_properties(tokens)
+            model["valuetypes"][name] = {"base": base, "constraints": [item["name"] for item in properties.get("constraints", [])]}
+        elif keyword == "constraint":
+            name = take_token(tokens)[1]
+            if accept_token(tokens, "on"):
+                value_type = take_token(tokens)[1]
+                take_token(tokens, ":")
+                model["constraints"][name] = {"type": "Expression", "on": value_type, "expression": parse_expression_tokens(tokens)}
+            else:
+                take_token(tokens, "oftype")
+                model["constraints"][name] = {"type": take_token(tokens)[1], "properties": parse_properties(tokens)}
+        elif keyword == "transform":
+            name = take_token(tokens)[1]
+            model["transforms"][name] = parse_transform(tokens)
+        else:
+            # pipe chain: A -> B -> C;
+            chain = [keyword]
+            while accept_token(tokens, "->"):
+                chain.append(take_token(tokens)[1])
+            take_token(tokens, ";")
+            model["pipes"].extend(zip(chain[:-1], chain[1:]))
+
+def parse_jv(text):
+    # valuetypes, constraints and transforms are shared by every pipeline in the file
+    model = {"pipelines": [], "blocks": {}, "pipes": [], "valuetypes": {}, "constraints": {}, "transforms": {}}
+    parse_definitions(token_stream(tokenize_jv(text)), model)
+    if not model["pipelines"]:
+        sys.exit("No pipeline definition found in the .jv file")
+    return model
+
+def parse_jv_file(jv_path):
+    with open(jv_path, "r", encoding="utf-8") as f:
+        return parse_jv(f.read())
+
+# -----------------PARSER-----------------#
+
+# -----------------EXPRESSIONS-----------------#
+
+# Expressions compile to functions over whole columns: value > 0 and value < 13 is two masks and one &
+binary_operators = {
+    "or": lambda left, right: left | right,
+    "and": lambda left, right: left & right,
+    "xor": lambda left, right: left ^ right,
+    "==": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+    "<": lambda left, right: left < right,
+    "<=": lambda left, right: left <= right,
+    ">": lambda left, right: left > right,
+    ">=": lambda left, right: left >= right,
+    "+": lambda left, right: left + right,
+    "-": lambda left, right: left - right,
+    "*": lambda left, right: left * right,
+    "/": lambda left, right: left / right,
+    "%": lambda left, right: left % right,
+}
+
+# lowest to highest precedence
+operator_levels = [["or", "xor"], ["and"], ["==", "!="], ["<", "<=", ">", ">="], ["+", "-"], ["*", "/", "%"]]
+
+def compile_expression(expression_tokens):
+    tokens = token_stream(expression_tokens)
+    compiled = compile_binary(tokens, 0)
+    if peek_token(tokens)[0] != "end":
+        sys.exit(f"Unexpected {peek_token(tokens)[1]!r} in expression")
+    return compiled
+
+def compile_binary(tokens, level):
+    if level == len(operator_levels):
+        return compile_unary(tokens)
+    left = compile_binary(tokens, level + 1)
+    while peek_token(tokens)[1] in operator_levels[level] and peek_token(tokens)[0] != "string":
+        operator = binary_operators[take_token(tokens)[1]]
+        right = compile_binary(tokens, level + 1)
+        left = (lambda left, right, operator: lambda env: operator(left(env), right(env)))(left, right, operator)
+    # matches binds to the comparison level
+    if level == 3 and peek_token(tokens)[1] == "matches":
+        take_token(tokens)
+        pattern = re.compile(take_token(tokens)[1])
+        operand = left
+        left = lambda env: operand(env).astype(str).str.contains(pattern, regex=True, na=False)
+    return left
+
+def compile_unary(tokens):
+    if accept_token(tokens, "not"):
+        operand = compile_unary(tokens)
+        return lambda env: ~operand(env)
+    if accept_token(tokens, "-"):
+        operand = compile_unary(tokens)
+        return lambda env: -operand(env)
+    if accept_token(tokens, "+"):
+        return compile_unary(tokens)
+    return compile_primary(tokens)
+
+def compile_primary(tokens):
+    kind, value = take_token(tokens)
+    if kind == "operator" and value == "(":
+        inner = compile_binary(tokens, 0)
+        take_token(tokens, ")")
+        return inner
+    if kind in ["number", "string"]:
+        return lambda env: value
+    if kind == "identifier" and value in ["true", "false"]:
+        return lambda env: value == "true"
+    if kind == "identifier":
+        return lambda env: env[value]
+    sys.exit(f"Unexpected {value!r} in expression")
+
+# -----------------EXPRESSIONS-----------------#
+
+# -----------------VALUE TYPES-----------------#
+
+integer_pattern = r"^[+-]?\d+$"
+decimal_pattern = r"^[+-]?(\d+([.,]\d*)?|[.,]\d+)([eE][+-]?\d+)?$"
+
+def parse_column_values(values, base_type):
+    # returns (typed values, mask of cells that parse as the type)
+    values = values.astype(str).str.strip() if base_type != "text" else values.astype(str)
+    if base_type == "text":
+        return values, pd.Series(True, index=values.index)
+    if base_type == "integer":
+        valid = values.str.match(integer_pattern)
+        return pd.to_numeric(values.where(valid), errors="coerce"), valid
+    if base_type == "decimal":
+        valid = values.str.match(decimal_pattern)
+        return pd.to_numeric(values.where(valid).str.replace(",", ".", regex=False), errors="coerce"), valid
+    if base_type == "boolean":
+        lowered = values.str.lower()
+        valid = lowered.isin(["true", "false"])
+        return lowered == "true", valid
+    sys.exit(f"Unknown value type {base_type}")
+
+def resolve_value_type(model, type_name):
+    # follows valuetype chains down to a builtin type, collecting constraints on the way
+    constraints = []
+    seen = set()
+    while type_name in model["valuetypes"]:
+        if type_name in seen:
+            sys.exit(f"Valuetype {type_name} is defined in terms of itself")
+        seen.add(type_name)
+        constraints.extend(model["valuetypes"][type_name]["constraints"])
+        type_name = model["valuetypes"][type_name]["base"]
+    return type_name, constraints
+
+def constraint_mask(model, constraint_name, values):
+    constraint = model["constraints"].get(constraint_name)
+    if constraint is None:
+        sys.exit(f"Unknown constraint {constraint_name}")
+    properties = constraint.get("properties", {})
+
+    if constraint["type"] == "Expression":
+        if "compiled" not in constraint:
+            constraint["compiled"] = compile_expression(constraint["expression"])
+        result = constraint["compiled"]({"value": values})
+        return result if isinstance(result, pd.Series) else pd.Series(bool(result), index=values.index)
+    if constraint["type"] == "RangeConstraint":
+        mask = pd.Series(True, index=values.index)
+        if "lowerBound" in properties:
+            mask &= values >= properties["lowerBound"] if properties.get("lowerBoundInclusive", True) else values > properties["lowerBound"]
+        if "upperBound" in properties:
+            mask &= values <= properties["upperBound"] if properties.get("upperBoundInclusive", True) else values < properties["upperBound"]
+        return mask
+    if constraint["type"] == "LengthConstraint":
+        lengths = values.astype(str).str.len()
+        return (lengths >= properties.get("minLength", 0)) & (lengths <= properties.get("maxLength", np.inf))
+    if constraint["type"] == "RegexConstraint":
+        return values.astype(str).str.contains(properties["regex"], regex=True, na=False)
+    if constraint["type"] == "AllowlistConstraint":
+        return values.isin(properties["allowlist"])
+    if constraint["type"] == "DenylistConstraint":
+        return ~values.isin(properties["denylist"])
+    sys.exit(f"Unsupported constraint type {constraint['type']} ({constraint_name})")
+
+def typed_column(model, values, type_name):
+    base_type, constraints = resolve_value_type(model, type_name)
+    typed, valid = parse_column_values(values, base_type)
+    for constraint_name in constraints:
+        valid &= constraint_mask(model, constraint_name, typed).fillna(False).astype(bool)
+    return typed, valid, base_type
+
+# -----------------VALUE TYPES-----------------#
+
+# -----------------BLOCKS-----------------#
+
+# Values flowing between blocks: {"kind": "file" | "text_file" | "directory" | "workbook" | "sheet" | "table", ...}
+
+def file_bytes(file_value):
+    if "data" in file_value:
+        return file_value["data"]
+    with open(file_value["path"], "rb") as f:
+        return f.read()
+
+def local_source_path(url, block_name, local_sources, source_directory):
+    for key in [block_name, url]:
+        if key in local_sources:
+            return local_sources[key]
+    if source_directory is not None:
+        candidate = os.path.join(source_directory, os.path.basename(url.split("?")[0]))
+        if os.path.exists(candidate):
+            return candidate
+    sys.exit(f"No local file for {block_name} ({url}). Pass one with --source {block_name}=PATH or --source-directory.")
+
+def run_http_extractor(block, value, context):
+    url = block["properties"]["url"]
+    path = local_source_path(url, block["name"], context["local_sources"], context["source_directory"])
+    return {"kind": "file", "name": os.path.basename(path), "path": path}
+
+def run_local_file_extractor(block, value, context):
+    path = os.path.normpath(os.path.join(context["working_directory"], block["properties"]["filePath"]))
+    return {"kind": "file", "name": os.path.basename(path), "path": path}
+
+def run_archive_interpreter(block, value, context):
+    if block["properties"].get("archiveType", "zip") != "zip":
+        sys.exit(f"{block['name']}: only zip archives are supported")
+    with zipfile.ZipFile(io.BytesIO(file_bytes(value))) as archive:
+        return {"kind": "directory", "files": {name: archive.read(name) for name in archive.namelist() if not name.endswith("/")}}
+
+def run_file_picker(block, value, context):
+    path = block["properties"]["path"]
+    normalized = path[2:] if path.startswith("./") else path.lstrip("/")
+    if normalized not in value["files"]:
+        sys.exit(f"{block['name']}: {path} not found in the archive")
+    return {"kind": "file", "name": os.path.basename(normalized), "data": value["files"][normalized]}
+
+def run_text_file_interpreter(block, value, context):
+    encoding = block["properties"].get("encoding", "utf-8")
+    return {"kind": "text_file", "name": value["name"], "text": file_bytes(value).decode(encoding, errors="replace")}
+
+def run_csv_interpreter(block, value, context):
+    properties = block["properties"]
+    enclosing = properties.get("enclosing", '"')
+    escape = properties.get("enclosingEscape", enclosing)
+    try:
+        sheet = pd.read_csv(io.StringIO(value["text"]), sep=properties.get("delimiter", ","), header=None, dtype=str,
+                            keep_default_na=False, na_filter=False, quotechar=enclosing or None,
+                            doublequote=escape == enclosing or len(escape) != 1,
+                            escapechar=escape if len(escape) == 1 and escape != enclosing else None)
+    except pd.errors.ParserError as e:
+        sys.exit(f"{block['name']}: could not parse {value['name']} as CSV: {e}")
+    sheet.columns = range(sheet.shape[1])
+    return {"kind": "sheet", "frame": sheet}
+
+def run_xlsx_interpreter(block, value, context):
+    try:
+        sheets = pd.read_excel(io.BytesIO(file_bytes(value)), sheet_name=None, header=None, dtype=str)
+    except ImportError:
+        sys.exit("openpyxl is required for XLSXInterpreter blocks. Install it with: pip install openpyxl")
+    return {"kind": "workbook", "sheets": {name: sheet.fillna("") for name, sheet in sheets.items()}}
+
+def run_sheet_picker(block, value, context):
+    name = block["properties"]["sheetName"]
+    if name not in value["sheets"]:
+        sys.exit(f"{block['name']}: sheet {name!r} not found, sheets are: {', '.join(value['sheets'])}")
+    sheet = value["sheets"][name].copy()
+    sheet.columns = range(sheet.shape[1])
+    return {"kind": "sheet", "frame": sheet.reset_index(drop=True)}
+
+def run_cell_range_selector(block, value, context):
+    selection = block["properties"]["select"]
+    (start_column, start_row), (end_column, end_row) = selection["start"], selection["end"]
+    frame = value["frame"].iloc[start_row or 0:None if end_row is None else end_row + 1, start_column:end_column + 1]
+    frame.columns = range(frame.shape[1])
+    return {"kind": "sheet", "frame": frame.reset_index(drop=True)}
+
+def run_column_deleter(block, value, context):
+    frame = value["frame"]
+    delete = {reference["index"] for reference in block["properties"]["delete"]}
+    frame = frame[[col for col in frame.columns if col not in delete]]
+    frame.columns = range(frame.shape[1])
+    return {"kind": "sheet", "frame": frame}
+
+def run_row_deleter(block, value, context):
+    delete = {reference["index"] for reference in block["properties"]["delete"]}
+    frame = value["frame"]
+    return {"kind": "sheet", "frame": frame[~np.isin(np.arange(len(frame)), list(delete))].reset_index(drop=True)}
+
+def run_cell_writer(block, value, context):
+    target = block["properties"]["at"]
+    write = block["properties"]["write"]
+    write = write if isinstance(write, list) else [write]
+    (start_column, start_row), (end_column, end_row) = target["start"], target["end"]
+    frame = value["frame"].copy()
+
+    # cells are filled row by row across the range
+    cells = [(row, column) for row in range(start_row, (end_row if end_row is not None else start_row) + 1)
+             for column in range(start_column, end_column + 1)]
+    for (row, column), text in zip(cells, write):
+        if column not in frame.columns:
+            frame[column] = ""
+        frame.loc[row, column] = text
+    return {"kind": "sheet", "frame": frame}
+
+def run_table_interpreter(block, value, context):
+    model = context["model"]
+    frame = value["frame"]
+    header = block["properties"].get("header", True)
+    columns = block["properties"]["columns"]
+
+    if header:
+        header_row = list(frame.iloc[0]) if len(frame) else []
+        body = frame.iloc[1:]
+        positions = []
+        for column in columns:
+            if column["name"] not in header_row:
+                sys.exit(f"{block['name']}: column {column['name']!r} not found in the header {header_row}")
+            positions.append(frame.columns[header_row.index(column["name"])])
+    else:
+        body = frame
+        positions = list(frame.columns[:len(columns)])
+
+    # every column is parsed and checked in one pass, rows with any invalid cell are dropped
+    valid_rows = pd.Series(True, index=body.index)
+    typed_columns = {}
+    for column, position in zip(columns, positions):
+        typed, valid, base_type = typed_column(model, body[position], column["type"])
+        typed_columns[column["name"]] = (typed, base_type)
+        valid_rows &= valid
+
+    table = pd.DataFrame({name: typed[valid_rows] for name, (typed, _) in typed_columns.items()}).reset_index(drop=True)
+    for name, (_, base_type) in typed_columns.items():
+        if base_type == "integer":
+            table[name] = table[name].astype("int64")
+        elif base_type == "decimal":
+            table[name] = table[name].astype("float64")
+
+    dropped_rows = int((~valid_rows).sum())
+    if dropped_rows:
+        print(f"{block['name']}: dropped {dropped_rows} row(s) with invalid values")
+    return {"kind": "table", "frame": table}
+
+def run_table_transformer(block, value, context):
+    model = context["model"]
+    properties = block["properties"]
+    transform = model["transforms"].get(properties["uses"]["name"])
+    if transform is None:
+        sys.exit(f"{block['name']}: unknown transform {properties['uses']['name']}")
+
+    frame = value["frame"]
+    environment = {parameter["name"]: frame[column] for parameter, column in zip(transform["inputs"], properties["inputColumns"])}
+    result = compile_expression(transform["expression"])(environment)
+
+    # integer outputs are truncated like the Jayvee interpreter does
+    if transform["output"]["type"] == "integer":
+        result = np.trunc(result).astype("int64")
+    return {"kind": "table", "frame": frame.assign(**{properties["outputColumn"]: result})}
+
+def run_sqlite_loader(block, value, context):
+    properties = block["properties"]
+    db_path = os.path.normpath(os.path.join(context["working_directory"], properties["file"]))
+    table_name = properties["table"]
+    df = value["frame"]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        previous_pragmas = apply_bulk_load_pragmas(conn)
+        conn.execute("BEGIN")
+        if properties.get("dropTable", True):
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        conn.execute(build_table_ddl(df, table_name, not_null_columns=[]).replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+        insert_rows_chunked(conn, df, table_name)
+        conn.commit()
+        restore_pragmas(conn, previous_pragmas)
+    except sqlite3.Error as e:
+        conn.rollback()
+        sys.exit(f"{block['name']}: loading into {db_path} failed: {e}")
+    finally:
+        conn.close()
+
+    print(f"{block['name']}: {len(df)} rows written to {table_name} in {db_path}")
+    return None
+
+block_runners = {
+    "HttpExtractor": run_http_extractor,
+    "LocalFileExtractor": run_local_file_extractor,
+    "ArchiveInterpreter": run_archive_interpreter,
+    "FilePicker": run_file_picker,
+    "TextFileInterpreter": run_text_file_interpreter,
+    "CSVInterpreter": run_csv_interpreter,
+    "XLSXInterpreter": run_xlsx_interpreter,
+    "SheetPicker": run_sheet_picker,
+    "CellRangeSelector": run_cell_range_selector,
+    "ColumnDeleter": run_column_deleter,
+    "RowDeleter": run_row_deleter,
+    "CellWriter": run_cell_writer,
+    "TableInterpreter": run_table_interpreter,
+    "TableTransformer": run_table_transformer,
+    "SQLiteLoader": run_sqlite_loader,
+}
+
+# -----------------BLOCKS-----------------#
+
+# -----------------RUNNER-----------------#
+
+def block_execution_order(pipeline):
+    blocks = pipeline["blocks"]
+    inputs = {}
+    for source, target in pipeline["pipes"]:
+        for name in [source, target]:
+            if name not in blocks:
+                sys.exit(f"Pipe refers to undefined block {name} in pipeline {pipeline['name']}")
+        if target in inputs:
+            sys.exit(f"Block {target} has more than one input in pipeline {pipeline['name']}")
+        inputs[target] = source
+
+    # depth-first topological order, blocks keep their definition order where possible
+    order, visiting = [], set()
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            sys.exit(f"Pipeline {pipeline['name']} has a cycle through {name}")
+        visiting.add(name)
+        if name in inputs:
+            visit(inputs[name])
+        order.append(name)
+    for name in blocks:
+        visit(name)
+    return order, inputs
+
+def run_jv_model(model, local_sources = None, source_directory = None, working_directory = None):
+    context = {
+        "model": model,
+        "local_sources": local_sources or {},
+        "source_directory": source_directory,
+        "working_directory": working_directory or os.getcwd(),
+    }
+
+    outputs = {}
+    for pipeline in model["pipelines"]:
+        print(f"Running Jayvee pipeline {pipeline['name']}...")
+        order, inputs = block_execution_order(pipeline)
+        for name in order:
+            block = pipeline["blocks"][name]
+            runner = block_runners.get(block["type"])
+            if runner is None:
+                sys.exit(f"Block type {block['type']} ({name}) is not supported. Supported: {', '.join(block_runners)}")
+            outputs[name] = runner(block, outputs.get(inputs.get(name)), context)
+    return outputs
+
+def run_jv_file(jv_path, local_sources = None, source_directory = None, working_directory = None):
+    return run_jv_model(parse_jv_file(jv_path), local_sources, source_directory, working_directory)
+
+# -----------------RUNNER-----------------#
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Jayvee (.jv) pipelines with pandas from local files")
+    parser.add_argument("jv_file", help="the .jv pipeline definition")
+    parser.add_argument("--source", action="append", default=[],
+                        help="BLOCK_OR_URL=PATH local file for an HttpExtractor, can be repeated")
+    parser.add_argument("--source-directory", default=None,
+                        help="directory searched for extractor files by the file name of their URL")
+    parser.add_argument("--working-directory", default=None,
+                        help="directory SQLite files are written to (defaults to the current directory)")
+    args = parser.parse_args()
+
+    sources = {}
+    for entry in args.source:
+        key, separator, path = entry.rpartition("=")
+        if not separator:
+            sys.exit(f"--source expects BLOCK_OR_URL=PATH, got {entry!r}")
+        sources[key] = path
+    run_jv_file(args.jv_file, sources, args.source_directory, args.working_directory)
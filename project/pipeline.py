@@ -3,16 +3,78 @@ import shutil
 import platform
 import subprocess
 import zipfile 
-import pandas as pd
+import fnmatch
 import sqlite3
 import time
 import sys
+import argparse
+import json
+import hashlib
+import importlib
+import importlib.util
+import threading
+import http
+import urllib.error
+import urllib.parse
+import multiprocessing
+import tracemalloc
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+lazy_modules = []
+lazy_modules_lock = threading.Lock()
+
+def lazy_import(name):
+
+    # The module is registered right away but only executed on its first attribute access
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    lazy_modules.append(module)
+
+    # like a regular import, a submodule becomes an attribute of its package
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(importlib.import_module(parent), child, module)
+    return module
+
+def load_lazy_modules():
+    # LazyLoader is not thread safe before Python 3.12, so everything is loaded before a thread pool starts
+    with lazy_modules_lock:
+        for module in lazy_modules:
+            getattr(module, "__doc__")
+
+# Heavy dependencies load when a stage first needs them, `status` and unchanged runs never import pandas
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+asyncio = lazy_import("asyncio")
+shared_memory = lazy_import("multiprocessing.shared_memory")
+lazy_import("http.client")
+lazy_import("urllib.request")
 
 #GLOBAL VARIABLES
 
+# Copy-on-write: column selections, renames and drops share the parent frame's buffers until one side is written to.
+# Only the pipeline's own runs (main, watch) switch it on, importing the module leaves the caller's pandas settings alone
+def enable_copy_on_write():
+    pd.set_option("mode.copy_on_write", True)
+
 script_directory = os.path.dirname(os.path.abspath(__file__))
 parent_directory = os.path.dirname(script_directory)
 
+# Download cache settings, the cache lives under data/cache
+maximum_cache_size_bytes = 1024 * 1024 * 1024
+cache_manifest_lock = threading.Lock()
+
+# Stage output cache settings, the cache lives under data/stage_cache
+maximum_stage_cache_size_bytes = 2 * 1024 * 1024 * 1024
+maximum_stage_cache_age_seconds = 7 * 24 * 60 * 60
+
 #-------------------------------- Set Kaggle API ------------------------#
 def setKaggleAPI():
     try:
@@ -49,54 +111,123 @@ def setKaggleAPI():
 
 # -----------------EXTRACT-----------------#
 
-def data_sets_extraction(dataset, maximum__download_retries = 3, api_call_retry_delay = 3):
-  
-    data_directory_path = os.path.join(parent_directory,"data")
-    zip_file_path = os.path.join(data_directory_path, dataset.split('/')[1]+ ".zip")
+kaggle_api_client_lock = threading.Lock()
+
+def kaggle_transport():
+    # "api" talks to Kaggle in-process, "cli" forks the kaggle command (kept for environments that stub the CLI)
+    return os.environ.get("PIPELINE_KAGGLE_TRANSPORT", "api")
+
+def kaggle_api_client():
+    # One authenticated client per process, None when the package or the credentials are not available
+    global _kaggle_api_client
+    with kaggle_api_client_lock:
+        if "_kaggle_api_client" not in globals():
+            try:
+                from kaggle.api.kaggle_api_extended import KaggleApi
+                client = KaggleApi()
+                client.authenticate()
+            except (Exception, SystemExit) as e:
+                print(f"Kaggle API client unavailable ({e}), falling back to the kaggle command line")
+                client = None
+            _kaggle_api_client = client
+    return _kaggle_api_client
+
+def run_kaggle_download(dataset, data_directory_path):
+    client = kaggle_api_client() if kaggle_transport() == "api" else None
+    if client is not None:
+        # the client raises its own ApiException and requests/urllib3 errors, they are retried like a failed kaggle command
+        try:
+            client.dataset_download_files(dataset, path=data_directory_path, quiet=True)
+        except Exception as e:
+            raise ConnectionError(f"Kaggle API download failed: {e}") from e
+    else:
+        subprocess.run(["kaggle", "datasets", "download", "-d", dataset,"-p",data_directory_path],
+        check=True)  # Explicitly capture stderr)
 
+def download_data_set(dataset, data_directory_path, maximum__download_retries = 3, api_call_retry_delay = 3, maximum_retry_delay = 60):
 
-    if not os.path.exists(data_directory_path):
-        os.makedirs(data_directory_path)
+    # Every dataset keeps its own retry state, so a slow or failing download
+    # backs off on its own without holding up the other datasets
+    retry_state = {"attempt": 0, "delay": api_call_retry_delay}
 
-    retry_network_call_count = 0
-    while retry_network_call_count <= maximum__download_retries:
+    while retry_state["attempt"] <= maximum__download_retries:
         try:
-            download_result_call = subprocess.run(["kaggle", "datasets", "download", "-d", dataset,"-p",data_directory_path],
-            check=True)  # Explicitly capture stderr)
-            break
-        
-        except subprocess.TimeoutExpired:
-            retry_network_call_count += 1
-            if retry_network_call_count >  maximum__download_retries:
+            run_kaggle_download(dataset, data_directory_path)
+            return
+
+        except (subprocess.TimeoutExpired, subprocess.CalledProcessError, http.client.HTTPException, urllib.error.URLError, ConnectionError) as e:
+            print(f"Error downloading dataset {dataset}: {e}")
+            retry_state["attempt"] += 1
+            if retry_state["attempt"] > maximum__download_retries:
                 print(f"Maximum tries reached. Dataset url: {dataset} could not be downloaded.")
                 sys.exit("Dataset couldnt be extracted.. Script can't be run further")
 
-            print(f"Retrying in {api_call_retry_delay} seconds...")   
-            time.sleep(api_call_retry_delay)
+            print(f"Retrying {dataset} in {retry_state['delay']} seconds...")
+            time.sleep(retry_state["delay"])
+            # exponential backoff per dataset
+            retry_state["delay"] = min(retry_state["delay"] * 2, maximum_retry_delay)
+
+def select_zip_member(zip_ref, member = None):
+    members = [name for name in zip_ref.namelist() if not name.endswith("/")]
+
+    # Default: first csv in the archive, falling back to the first file
+    if member is None:
+        csv_members = [name for name in members if name.lower().endswith(".csv")]
+        if csv_members:
+            return csv_members[0]
+        if members:
+            return members[0]
+        sys.exit(f"Zip file {zip_ref.filename} is empty. Terminating script...")
+
+    # Exact name first, then a glob pattern such as "*wages*.csv"
+    if member in members:
+        return member
+    matches = [name for name in members if fnmatch.fnmatch(name, member) or fnmatch.fnmatch(os.path.basename(name), member)]
+    if not matches:
+        sys.exit(f"No member matching '{member}' in {zip_ref.filename}. Available: {', '.join(members)}")
+    return matches[0]
+
+def read_csv_from_zip(zip_file_path, member = None, usecols = None, dtype = None):
+
+    # The archive member is parsed straight from the stream in one pass, nothing is written to disk
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        csv_member = select_zip_member(zip_ref, member)
+        with zip_ref.open(csv_member) as csv_file:
+            return pd.read_csv(csv_file, usecols=usecols, dtype=dtype)
+
+def iter_csv_chunks_from_zip(zip_file_path, member = None, usecols = None, dtype = None, chunksize = 100000):
+
+    # Same streaming read, but only one chunk of rows is held in memory at a time
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        csv_member = select_zip_member(zip_ref, member)
+        with zip_ref.open(csv_member) as csv_file:
+            for chunk in pd.read_csv(csv_file, usecols=usecols, dtype=dtype, chunksize=chunksize):
+                yield chunk
+
+def data_sets_extraction(dataset, maximum__download_retries = 3, api_call_retry_delay = 3, data_directory_path = None, use_cache = False, cache_directory_path = None, member = None, usecols = None, dtype = None):
+  
+    if data_directory_path is None:
+        data_directory_path = os.path.join(parent_directory,"data")
+    zip_file_path = os.path.join(data_directory_path, dataset.split('/')[1]+ ".zip")
 
-        except subprocess.CalledProcessError as e:
-            print(f"Error downloading dataset: {e}")
-            retry_network_call_count += 1
-            if retry_network_call_count > maximum__download_retries:
-                print(f"Maximum tries reached. Dataset url: {dataset} could not be downloaded.")
-                sys.exit("Dataset couldnt be extracted.. Script can't be run further")
+    if use_cache:
+        if cache_directory_path is None:
+            cache_directory_path = os.path.join(data_directory_path, "cache")
+        return cached_data_set_extraction(dataset, cache_directory_path, maximum__download_retries, api_call_retry_delay, member=member, usecols=usecols, dtype=dtype)
 
-            print(f"Retrying in {api_call_retry_delay} seconds...")
-            time.sleep(api_call_retry_delay)
+    if not os.path.exists(data_directory_path):
+        os.makedirs(data_directory_path)
+
+    download_data_set(dataset, data_directory_path, maximum__download_retries, api_call_retry_delay)
             
     if os.path.exists(zip_file_path):
         try:
-            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                zip_ref.extractall(data_directory_path)
-                print("Dataset extracted - Success!")
-                    
-                csv_file = zip_ref.namelist()
-                
-                df = pd.read_csv(data_directory_path+"/"+csv_file[0])
-                
-                os.remove(zip_file_path)
-                
-                return df
+            df = read_csv_from_zip(zip_file_path, member, usecols, dtype)
+            print("Dataset extracted - Success!")
+
+            os.remove(zip_file_path)
+
+            return df
         except zipfile.BadZipFile as badzip:
             print(f"File is not compatible with ZIP format. Error while unzipping {zip_file_path}")
         except Exception as e:
@@ -105,90 +236,342 @@ def data_sets_extraction(dataset, maximum__download_retries = 3, api_call_retry_
     else:
         print("The zip file does not exist.")
         sys.exit("Error: Download failed and No zip file found. Terminating script...")
-# -----------------EXTRACT-----------------#
 
-# -----------------TRANSFORM-----------------#
-
-def fill_missing_values(df, columns, strategy = "mean"):
-    
-    for col in columns:
-        if col in df.columns:
-            value_to_fill = df[col].mean()
-            if(strategy == "mean"):
-                value_to_fill = df[col].mean()
-            elif(strategy == "mode"):
-                value_to_fill = df[col].mode()[0]
-            elif(strategy == "median"):
-                value_to_fill = df[col].median()
-            else:
-                print("Invalid Strategy given in argument... Using mean as default")
-                #return df
+def extract_data_sets(datasets, max_workers = 4, maximum__download_retries = 3, api_call_retry_delay = 3, data_directory_path = None, use_cache = True, read_options = None):
 
-            df.fillna({col: value_to_fill}, inplace=True)
-    return df
-
-def fill_missing_values_excluding_columns(df, exclude_columns = [], strategy = "mean"):
-
-    columns_to_fill = [col for col in df.columns if col not in exclude_columns]
-    
-    for col in columns_to_fill:
-        if col in df.columns:
-            value_to_fill = df[col].mean()
-            if(strategy == "mean"):
-                value_to_fill = df[col].mean()
-            elif(strategy == "mode"):
-                value_to_fill = df[col].mode()[0]
-            elif(strategy == "median"):
-                value_to_fill = df[col].median()
-            else:
-                print("Invalid Strategy given in argument... Using mean as default")
-                return df
+    if not datasets:
+        return []
 
-            df.fillna({col: value_to_fill}, inplace=True)
-    
-    return df
+    # Optional per-dataset reader settings: member, usecols and dtype
+    if read_options is None:
+        read_options = [{} for _ in datasets]
 
-def drop_duplicates(df, columns_subset = None):
-    return df.drop_duplicates(subset = columns_subset)
+    # Bounded pool: downloads are network bound, so threads are enough here
+    workers = max(1, min(max_workers, len(datasets)))
 
-def merge_data_sets(wages_data_transformed, employment_data_transformed):
+    load_lazy_modules()
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        futures = [
+            executor.submit(data_sets_extraction, dataset, maximum__download_retries, api_call_retry_delay, data_directory_path, use_cache, **options)
+            for dataset, options in zip(datasets, read_options)
+        ]
+        # Results are collected in the order the datasets were requested
+        return [future.result() for future in futures]
+
+def fetch_data_set_archives(datasets, max_workers = 4, maximum__download_retries = 3, api_call_retry_delay = 3, data_directory_path = None):
+
+    # Same scheduler, but only the cached zip paths are returned (used by the streaming mode)
+    if data_directory_path is None:
+        data_directory_path = os.path.join(parent_directory,"data")
+    cache_directory_path = os.path.join(data_directory_path, "cache")
+
+    workers = max(1, min(max_workers, len(datasets)))
+    load_lazy_modules()
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        futures = [
+            executor.submit(fetch_data_set_archive, dataset, cache_directory_path, maximum__download_retries, api_call_retry_delay)
+            for dataset in datasets
+        ]
+        return [future.result() for future in futures]
+# -----------------EXTRACT-----------------#
 
-    # if on or both datasets are empty
-    if wages_data_transformed.empty or employment_data_transformed.empty:
-        sys.exit("Cannot merge the given datasets as one or both are empty. Please verify the previous steps /n Exiting pipeline...")
+# -----------------DOWNLOAD CACHE-----------------#
 
-    if "year" in wages_data_transformed.columns and "year" in employment_data_transformed.columns:
-        try:
-           return pd.merge(wages_data_transformed,employment_data_transformed) 
-        except Exception as e:
-           sys.exit("Unknown error occurred while merging datasets. Pipeline terminated...")
-
-def drop_columns(df, columns_to_drop = []):
-    return df.drop(columns=columns_to_drop)
-    
-def transform_wages_data_set(wages_data):
+def fetch_data_set_version(dataset):
+    # Cheap metadata call: the file listing (names, sizes, creation dates) changes whenever a new version is published
+    client = kaggle_api_client() if kaggle_transport() == "api" else None
+    try:
+        if client is not None:
+            files = client.dataset_list_files(dataset).files
+            listing = "\n".join(f"{getattr(f, 'name', f)},{getattr(f, 'totalBytes', getattr(f, 'size', ''))},{getattr(f, 'creationDate', '')}" for f in files)
+        else:
+            listing = subprocess.run(["kaggle", "datasets", "files", "-v", dataset], check=True, capture_output=True, text=True).stdout
+        return hashlib.sha256(listing.encode("utf-8")).hexdigest()[:16]
+    except Exception as e:
+        print(f"Could not fetch version metadata for {dataset}: {e}")
+        return None
+
+def file_content_hash(file_path, block_size = 1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def cache_key(dataset, version):
+    return f"{dataset.replace('/', '__')}@{version}"
+
+def read_cache_manifest(cache_directory_path):
+    manifest_path = os.path.join(cache_directory_path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print("Cache manifest is unreadable, starting with an empty cache")
+        return {}
+
+def write_cache_manifest(cache_directory_path, manifest):
+    manifest_path = os.path.join(cache_directory_path, "manifest.json")
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path)
+
+def is_cache_entry_valid(entry):
+    zip_path = entry.get("zip_path")
+    return zip_path is not None and os.path.exists(zip_path) and os.path.getsize(zip_path) == entry.get("size")
+
+def find_cache_entry(manifest, dataset, version):
+    if version is not None:
+        entry = manifest.get(cache_key(dataset, version))
+        return entry if entry and is_cache_entry_valid(entry) else None
+
+    # Without version metadata (e.g. offline) fall back to the most recently used copy
+    entries = [entry for entry in manifest.values() if entry["dataset"] == dataset and is_cache_entry_valid(entry)]
+    return max(entries, key=lambda entry: entry["last_used"]) if entries else None
+
+def evict_cache_entries(cache_directory_path, manifest, maximum_size_bytes, keep_key = None):
+    total_size = sum(entry["size"] for entry in manifest.values())
+
+    # Least recently used entries go first
+    for key, entry in sorted(manifest.items(), key=lambda item: item[1]["last_used"]):
+        if total_size <= maximum_size_bytes:
+            break
+        if key == keep_key:
+            continue
+        del manifest[key]
+        total_size -= entry["size"]
+        # Content addressed folders can be shared by several versions
+        if not any(other["content_hash"] == entry["content_hash"] for other in manifest.values()):
+            shutil.rmtree(os.path.join(cache_directory_path, entry["content_hash"]), ignore_errors=True)
+        print(f"Cache evicted: {key}")
 
-    # Check if wages data is not empty
-    if wages_data.empty:
-        sys.exit("Wages Dataset is empty. Cannot continue the pipeline...")
+def fetch_data_set_archive(dataset, cache_directory_path, maximum__download_retries = 3, api_call_retry_delay = 3, maximum_size_bytes = None):
 
+    if maximum_size_bytes is None:
+        maximum_size_bytes = maximum_cache_size_bytes
 
-    #1. Remove unnecessary columns
-    wages_data_columns_to_keep = ['year'] + [col for col in wages_data.columns if 'white' in col or 'black' in col]
-    wages_data = wages_data[wages_data_columns_to_keep]
+    os.makedirs(cache_directory_path, exist_ok=True)
+    version = fetch_data_set_version(dataset)
 
-    columns_to_drop = ["white_less_than_hs", "white_high_school","white_some_college", "white_bachelors_degree", "white_advanced_degree","black_less_than_hs", "black_high_school", "black_some_college", "black_bachelors_degree", "black_advanced_degree"]
-    wages_data = drop_columns(wages_data, columns_to_drop)
+    with cache_manifest_lock:
+        entry = find_cache_entry(read_cache_manifest(cache_directory_path), dataset, version)
 
-    # Check if year column exists
-    if 'year' not in wages_data.columns:
-        sys.exit("Year column is missing from the data. Pipeline terminated....")
+    if entry is not None:
+        print(f"Cache hit: {dataset} (version {entry['version']}), skipping download")
+    else:
+        print(f"Cache miss: {dataset} (version {version}), downloading...")
+
+        # Each dataset downloads into its own folder so concurrent downloads do not collide
+        download_directory_path = os.path.join(cache_directory_path, "downloads", dataset.replace("/", "__"))
+        shutil.rmtree(download_directory_path, ignore_errors=True)
+        os.makedirs(download_directory_path)
+        download_data_set(dataset, download_directory_path, maximum__download_retries, api_call_retry_delay)
+
+        zip_file_path = os.path.join(download_directory_path, dataset.split('/')[1] + ".zip")
+        if not os.path.exists(zip_file_path):
+            print("The zip file does not exist.")
+            sys.exit("Error: Download failed and No zip file found. Terminating script...")
+
+        if not zipfile.is_zipfile(zip_file_path):
+            shutil.rmtree(download_directory_path, ignore_errors=True)
+            sys.exit(f"File is not compatible with ZIP format. Error while unzipping {zip_file_path}")
+
+        content_hash = file_content_hash(zip_file_path)
+        content_directory_path = os.path.join(cache_directory_path, content_hash)
+        os.makedirs(content_directory_path, exist_ok=True)
+
+        cached_zip_path = os.path.join(content_directory_path, os.path.basename(zip_file_path))
+        os.replace(zip_file_path, cached_zip_path)
+        shutil.rmtree(download_directory_path, ignore_errors=True)
+
+        entry = {
+            "dataset": dataset,
+            "version": version if version is not None else content_hash[:16],
+            "content_hash": content_hash,
+            "zip_path": cached_zip_path,
+            "size": os.path.getsize(cached_zip_path),
+        }
+
+    with cache_manifest_lock:
+        manifest = read_cache_manifest(cache_directory_path)
+        key = cache_key(dataset, entry["version"])
+        entry["last_used"] = time.time()
+        manifest[key] = entry
+        evict_cache_entries(cache_directory_path, manifest, maximum_size_bytes, keep_key=key)
+        write_cache_manifest(cache_directory_path, manifest)
+
+    return entry["zip_path"]
+
+def cached_data_set_extraction(dataset, cache_directory_path, maximum__download_retries = 3, api_call_retry_delay = 3, maximum_size_bytes = None, member = None, usecols = None, dtype = None):
+    zip_file_path = fetch_data_set_archive(dataset, cache_directory_path, maximum__download_retries, api_call_retry_delay, maximum_size_bytes)
+    return read_csv_from_zip(zip_file_path, member, usecols, dtype)
+
+# -----------------DOWNLOAD CACHE-----------------#
+
+# -----------------SOURCE ADAPTERS-----------------#
+
+# A source is a Kaggle dataset ("owner/slug" or "kaggle://owner/slug"), a local file ("file:///path" or a plain path
+# to a .zip/.csv) or an HTTP(S) URL. Every adapter returns the path of a local zip or csv file.
+
+def source_adapter_name(source):
+    scheme = urllib.parse.urlsplit(source).scheme.lower()
+    if scheme in ["http", "https"]:
+        return "http"
+    if scheme == "file" or os.path.exists(source) or source.lower().endswith((".zip", ".csv")):
+        return "file"
+    return "kaggle"
+
+def fetch_kaggle_source(source, cache_directory_path, maximum__download_retries = 3, api_call_retry_delay = 3):
+    dataset = source[len("kaggle://"):] if source.startswith("kaggle://") else source
+    return fetch_data_set_archive(dataset, cache_directory_path, maximum__download_retries, api_call_retry_delay)
+
+def fetch_local_source(source, cache_directory_path = None, maximum__download_retries = 3, api_call_retry_delay = 3):
+    # air-gapped runs and tests: the file is read where it is, nothing is copied
+    path = urllib.parse.unquote(urllib.parse.urlsplit(source).path) if source.startswith("file://") else source
+    if not os.path.exists(path):
+        sys.exit(f"Local source {source} does not exist. Terminating script...")
+    return os.path.abspath(path)
+
+def fetch_http_source(source, cache_directory_path, maximum__download_retries = 3, api_call_retry_delay = 3, maximum_retry_delay = 60, block_size = 1024 * 1024):
+
+    file_name = os.path.basename(urllib.parse.urlsplit(source).path) or "download"
+    download_directory_path = os.path.join(cache_directory_path, "http", hashlib.sha256(source.encode("utf-8")).hexdigest()[:16])
+    os.makedirs(download_directory_path, exist_ok=True)
+    target_path = os.path.join(download_directory_path, file_name)
+    partial_path = target_path + ".part"
+    validator_path = partial_path + ".validator"
+
+    # mirror URLs are versioned, a finished download is reused as is
+    if os.path.exists(target_path):
+        print(f"Cache hit: {source}, skipping download")
+        return target_path
+
+    retry_state = {"attempt": 0, "delay": api_call_retry_delay}
+    while True:
+        # A partial file from an earlier attempt resumes with a range request instead of starting from zero.
+        # If-Range makes the server send the whole file again if it changed in between.
+        resume_from = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        request = urllib.request.Request(source)
+        if resume_from:
+            request.add_header("Range", f"bytes={resume_from}-")
+            if os.path.exists(validator_path):
+                with open(validator_path, "r") as f:
+                    request.add_header("If-Range", f.read())
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                resumed = resume_from > 0 and response.status == 206
+                if resumed:
+                    print(f"Resuming {source} from byte {resume_from}")
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if validator:
+                    with open(validator_path, "w") as f:
+                        f.write(validator)
+                with open(partial_path, "ab" if resumed else "wb") as f:
+                    shutil.copyfileobj(response, f, block_size)
+
+                # a dropped connection just ends the body early, check the size before accepting the file
+                content_length = response.headers.get("Content-Length")
+                expected_size = (resume_from if resumed else 0) + int(content_length) if content_length else None
+                if expected_size is not None and os.path.getsize(partial_path) < expected_size:
+                    raise http.client.IncompleteRead(b"", expected_size - os.path.getsize(partial_path))
+            os.replace(partial_path, target_path)
+            if os.path.exists(validator_path):
+                os.remove(validator_path)
+            return target_path
+
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            # nothing left to resume from a 416 (range not satisfiable), start over
+            if isinstance(e, urllib.error.HTTPError) and e.code == 416 and os.path.exists(partial_path):
+                os.remove(partial_path)
+            print(f"Error downloading {source}: {e}")
+            retry_state["attempt"] += 1
+            if retry_state["attempt"] > maximum__download_retries:
+                sys.exit(f"Maximum tries reached. {source} could not be downloaded. Script can't be run further")
+            print(f"Retrying {source} in {retry_state['delay']} seconds...")
+            time.sleep(retry_state["delay"])
+            retry_state["delay"] = min(retry_state["delay"] * 2, maximum_retry_delay)
+
+source_adapters = {"kaggle": fetch_kaggle_source, "file": fetch_local_source, "http": fetch_http_source}
+
+def fetch_source(source, cache_directory_path, maximum__download_retries = 3, api_call_retry_delay = 3):
+    return source_adapters[source_adapter_name(source)](source, cache_directory_path, maximum__download_retries, api_call_retry_delay)
+
+def source_version(source):
+    # stage cache key for an extraction, None when the source cannot tell whether it changed
+    adapter = source_adapter_name(source)
+    if adapter == "kaggle":
+        return fetch_data_set_version(source[len("kaggle://"):] if source.startswith("kaggle://") else source)
+    if adapter == "file":
+        stat = os.stat(fetch_local_source(source))
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    return None
+
+def read_source_file(file_path, member = None, usecols = None, dtype = None):
+    if zipfile.is_zipfile(file_path):
+        return read_csv_from_zip(file_path, member, usecols, dtype)
+    return pd.read_csv(file_path, usecols=usecols, dtype=dtype)
+
+# Downloads are started on a background asyncio loop as soon as the sources are known,
+# so later datasets are already arriving while earlier ones are being transformed
+prefetch_state = {"loop": None, "thread": None, "semaphore": None, "futures": {}}
+prefetch_lock = threading.Lock()
+
+async def prefetch_source(source, cache_directory_path, semaphore):
+    async with semaphore:
+        return await asyncio.to_thread(fetch_source, source, cache_directory_path)
+
+def start_prefetch(sources, cache_directory_path, max_concurrency = 4):
+    load_lazy_modules()
+    with prefetch_lock:
+        if prefetch_state["loop"] is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="source-prefetch", daemon=True)
+            thread.start()
+            prefetch_state.update(loop=loop, thread=thread, semaphore=asyncio.Semaphore(max_concurrency))
+        for source in sources:
+            if source not in prefetch_state["futures"]:
+                prefetch_state["futures"][source] = asyncio.run_coroutine_threadsafe(
+                    prefetch_source(source, cache_directory_path, prefetch_state["semaphore"]), prefetch_state["loop"])
+
+def fetch_prefetched_source(source, cache_directory_path):
+    # waits for a running prefetch of this source, or fetches it right away when none was started
+    with prefetch_lock:
+        future = prefetch_state["futures"].pop(source, None)
+    if future is not None:
+        return future.result()
+    return fetch_source(source, cache_directory_path)
+
+def stop_prefetch():
+    with prefetch_lock:
+        loop, thread = prefetch_state["loop"], prefetch_state["thread"]
+        for future in prefetch_state["futures"].values():
+            future.cancel()
+        prefetch_state.update(loop=None, thread=None, semaphore=None, futures={})
+    if loop is not None:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def setup_sources(sources, cache_directory_path):
+    # Kaggle credentials are only needed when a Kaggle source is configured
+    if any(source_adapter_name(source) == "kaggle" for source in sources):
+        setKaggleAPI()
+    start_prefetch(sources, cache_directory_path)
+
+def extract_source_data_set(source, cache_directory_path = None, member = None, usecols = None, dtype = None):
+    if cache_directory_path is None:
+        cache_directory_path = os.path.join(parent_directory, "data", "cache")
+    return read_source_file(fetch_prefetched_source(source, cache_directory_path), member, usecols, dtype)
+
+# -----------------SOURCE ADAPTERS-----------------#
 
-    wages_years_to_remove = [1973,1974,1975,1976,1977,1978]
-    wages_data = wages_data[~wages_data["year"].isin(wages_years_to_remove)]
+# -----------------TRANSFORM-----------------#
 
-    #2. Renaming columns
-    wages_data_mapper = {
+# Source column -> pipeline column maps, they also drive what ingestion reads
+wages_data_mapper = {
     # 'white_less_than_hs': 'White_Less_HS_Hourly_Wage',
     # 'white_high_school': 'White_HS_Hourly_Wage',
     # 'white_some_college': 'White_Some_College_Hourly_Wage',
@@ -219,120 +602,9 @@ def transform_wages_data_set(wages_data):
     'black_women_some_college': 'Black_Women_Some_College_Hourly_Wage',
     'black_women_bachelors_degree': 'Black_Women_Bachelors_Degree_Hourly_Wage',
     'black_women_advanced_degree': 'Black_Women_Advanced_Degree_Hourly_Wage' 
-    }
-
-    # Filter the mapping to only include columns that exist in the dataset
-    existing_columns_mapper = {old_col: new_col for old_col, new_col in wages_data_mapper.items() if old_col in wages_data.columns}
-
-    # Check if any columns are skipped
-    if len(existing_columns_mapper) < len(wages_data_mapper):
-        missing_columns = set(wages_data_mapper.keys()) - set(existing_columns_mapper.keys())
-        print(f"Warning: Skipped the following columns as they dont exist: {', '.join(missing_columns)}")
-
-    wages_data = wages_data.rename(columns = wages_data_mapper)
-    
-    #3. Remove duplicates 
-    wages_data = drop_duplicates(wages_data)
-
-    #4. fill na values with imputation strategy defined by user, default = "mean"
-    wages_data = fill_missing_values_excluding_columns(wages_data, ["year"], "mean")
-
-
-    #5. Adding new columns - White and Black people avg hourly wage for both men and women combined
-
-    white_men_cols = [
-    'White_Men_Less_Than_High_School_Hourly_Wage', 'White_Men_HS_Hourly_Wage',
-    'White_Men_Some_College_Hourly_Wage', 'White_Men_Bachelors_Hourly_Wage',
-    'White_Men_Advanced_Hourly_Wage'
-        ]
-
-    black_men_cols = [
-    'Black_Men_Less_Than_High_School_Hourly_Wage', 'Black_Men_HS_Hourly_Wage',
-    'Black_Men_Some_College_Hourly_Wage', 'Black_Men_Bachelors_Hourly_Wage',
-    'Black_Men_Advanced_Hourly_Wage'
-    ]
-
-    white_women_cols = [
-    'White_Women_Less_Than_High_School_Hourly_Wage', 'White_Women_HS_Hourly_Wage',
-    'White_Women_Some_College_Hourly_Wage', 'White_Women_Bachelors_Hourly_Wage',
-    'White_Women_Advanced_Hourly_Wage'
-    ]
-
-    black_women_cols = [
-    'Black_Women_Less_Than_High_School_Hourly_Wage', 'Black_Women_HS_Hourly_Wage',
-    'Black_Women_Some_College_Hourly_Wage', 'Black_Women_Bachelors_Degree_Hourly_Wage',
-    'Black_Women_Advanced_Degree_Hourly_Wage'
-    ]
-
-    wages_data['White_Men_Avg_Wage'] = wages_data[white_men_cols].mean(axis=1).round(2)
-    wages_data['Black_Men_Avg_Wage'] = wages_data[black_men_cols].mean(axis=1).round(2)
-    wages_data['White_Women_Avg_Wage'] = wages_data[white_women_cols].mean(axis=1).round(2)
-    wages_data['Black_Women_Avg_Wage'] = wages_data[black_women_cols].mean(axis=1).round(2)
-
-    wages_data['White_Men_vs_Black_Men_Wage_Gap'] = abs(wages_data['White_Men_Avg_Wage'] - wages_data['Black_Men_Avg_Wage']).round(2)
-    wages_data['White_Women_vs_Black_Women_Wage_Gap'] = abs(wages_data['White_Women_Avg_Wage'] - wages_data['Black_Women_Avg_Wage']).round(2)
-
-    wages_data['White_Men_vs_White_Women_Wage_Gap'] = abs(wages_data['White_Men_Avg_Wage'] - wages_data['White_Women_Avg_Wage']).round(2)
-    wages_data['Black_Men_vs_Black_Women_Wage_Gap'] = abs(wages_data['Black_Men_Avg_Wage'] - wages_data['Black_Women_Avg_Wage']).round(2)
-
-    # Percentage Difference
-    wages_data['White_Men_vs_Black_Men_Wage_Gap_Percent'] = ((
-        wages_data['White_Men_vs_Black_Men_Wage_Gap'] / ((wages_data['White_Men_Avg_Wage'] + wages_data['Black_Men_Avg_Wage']) / 2) 
-    ) * 100).round(2)
+}
 
-    wages_data['White_Women_vs_Black_Women_Gap_Percent'] = ((
-        wages_data['White_Women_vs_Black_Women_Wage_Gap'] / ((wages_data['White_Women_Avg_Wage'] + wages_data['Black_Women_Avg_Wage']) / 2) 
-    ) * 100).round(2)
-
-    wages_data['White_Men_vs_White_Women_Wage_Gap_Percent'] = ((
-        wages_data['White_Men_vs_White_Women_Wage_Gap'] / ((wages_data['White_Men_Avg_Wage'] + wages_data['White_Women_Avg_Wage']) / 2) 
-    ) * 100).round(2)
-
-    wages_data['Black_Men_vs_Black_Women_Wage_Gap_Percent'] = ((
-        wages_data['Black_Men_vs_Black_Women_Wage_Gap'] / ((wages_data['Black_Men_Avg_Wage'] + wages_data['Black_Women_Avg_Wage']) / 2) 
-    ) * 100).round(2)
-
-    # white_columns = ['White_Less_HS_Hourly_Wage', 'White_HS_Hourly_Wage', 'White_Some_College_Hourly_Wage',
-    #              'White_Bachelors_Hourly_Wage', 'White_Advanced_Hourly_Wage']
-    # wages_data['White_People_Average_Hourly_Wage'] = wages_data[white_columns].mean(axis=1)
-
-    # black_columns = ['Black_Less_HS_Hourly_Wage', 'Black_HS_Hourly_Wage', 'Black_Some_College_Hourly_Wage',
-    #              'Black_Bachelors_Hourly_Wage', 'Black_Advanced_Hourly_Wage']
-    # wages_data['Black_People_Average_Hourly_Wage'] = wages_data[black_columns].mean(axis=1)
-
-    # wages_data['Black_People_Average_Hourly_Wage'] = wages_data['Black_People_Average_Hourly_Wage'].round(2)
-    # wages_data['White_People_Average_Hourly_Wage'] = wages_data['White_People_Average_Hourly_Wage'].round(2)
-    
-    return wages_data
-
-
-def transform_employment_data_set(employment_data):
-
-    # Check if wages data is not empty
-    if employment_data.empty:
-        sys.exit("Employment Dataset is empty. Cannot continue the pipeline...")
-
-    #1. Remove unnecessary columns
-    employment_data_to_keep = ['year'] + ['total_population'] + [col for col in employment_data.columns if 'white' in col or 'black' in col]
-    employment_data = employment_data[employment_data_to_keep]
-
-    columns_to_drop = ["black", "black_16-24", "black_25-54", "black_55-64", "black_65+",
-                       "black_less_than_hs", "black_high_school", "black_some_college",
-                       "black_bachelors_degree", "black_advanced_degree", "black_women", "black_women_16-24",
-                        "black_women_25-54","black_women_55-64","black_women_65+", "black_men","black_men_16-24",
-                        "black_men_25-54","black_men_55-64","black_men_65+",
-
-                        "white", "white_16-24", "white_25-54", "white_55-64", "white_65+",
-                       "white_less_than_hs", "white_high_school", "white_some_college",
-                       "white_bachelors_degree", "white_advanced_degree", "white_women", "white_women_16-24",
-                        "white_women_25-54","white_women_55-64","white_women_65+", "white_men","white_men_16-24",
-                        "white_men_25-54","white_men_55-64","white_men_65+"]
-
-    employment_data = drop_columns(employment_data, columns_to_drop)
-
-
-    #2. Renaming columns
-    employment_data_mapper = {
+employment_data_mapper = {
     # 'black': 'Black_Employment_Ratio_All_Ages',
     # 'black_16-24': 'Black_Employment_Ratio_Age_16_24',
     # 'black_25-54': 'Black_Employment_Ratio_Age_25_54',
@@ -363,7 +635,7 @@ def transform_employment_data_set(employment_data):
     'black_men_some_college': 'Black_Men_Employment_Ratio_Some_College',
     'black_men_bachelors_degree': 'Black_Men_Employment_Ratio_Bachelors_Degree',
     'black_men_advanced_degree': 'Black_Men_Employment_Ratio_Advanced_Degree',
-    
+
     # 'white': 'White_Employment_Ratio_All_Ages',
     # 'white_16-24': 'White_Employment_Ratio_Age_16_24',
     # 'white_25-54': 'White_Employment_Ratio_Age_25_54',
@@ -394,172 +666,2211 @@ def transform_employment_data_set(employment_data):
     'white_men_some_college': 'White_Men_Employment_Ratio_Some_College',
     'white_men_bachelors_degree': 'White_Men_Employment_Ratio_Bachelors_Degree',
     'white_men_advanced_degree': 'White_Men_Employment_Ratio_Advanced_Degree'
+}
+
+wages_years_to_remove = [1973,1974,1975,1976,1977,1978]
+
+# Optional key columns besides year (e.g. region in finer grained extracts), kept through the transforms and used in the merge
+dimension_columns = ["region"]
+
+def frame_key_columns(df):
+    # a row is identified by its year and, in finer grained extracts, its dimension columns (region)
+    return ["year"] + [col for col in dimension_columns if col in df.columns]
+
+def frame_dimension_columns(df):
+    # group_by for the imputation strategies, each region is interpolated along its own years
+    present = [col for col in dimension_columns if col in df.columns]
+    return present or None
+
+# Frame policy from ingestion onward: only the mapped columns, int16 years and categorical dimensions. Metrics stay
+# float64, a narrower float would publish e.g. 10.74 as 10.739999771118164. The benchmark's frame MB column shows the sizes
+def build_ingestion_schema(column_mapper, extra_columns = ["year"], metric_dtype = "float64", dimension_dtype = "category"):
+
+    # Only the mapped columns (plus keys like year) are parsed, everything else is skipped by the reader
+    columns_to_read = list(extra_columns) + dimension_columns + list(column_mapper)
+    dtype = {col: metric_dtype for col in columns_to_read}
+    dtype["year"] = "int16"
+    for col in dimension_columns:
+        dtype[col] = dimension_dtype
+
+    # callable usecols tolerates columns missing in the source, the transforms warn about those
+    return {"usecols": frozenset(columns_to_read).__contains__, "dtype": dtype}
+
+wages_ingestion_schema = build_ingestion_schema(wages_data_mapper, ["year"])
+employment_ingestion_schema = build_ingestion_schema(employment_data_mapper, ["year", "total_population"])
+
+def build_demographic_groups(column_mapper, races = ["white", "black"], sexes = ["men", "women"]):
+
+    # Group "White_Men" holds every renamed column whose source column starts with "white_men_" (all education levels)
+    return {
+        f"{race.capitalize()}_{sex.capitalize()}": [new_col for old_col, new_col in column_mapper.items() if old_col.startswith(f"{race}_{sex}_")]
+        for sex in sexes for race in races
     }
 
+demographic_comparisons = [
+    ("White_Men", "Black_Men"),
+    ("White_Women", "Black_Women"),
+    ("White_Men", "White_Women"),
+    ("Black_Men", "Black_Women"),
+]
+
+wages_metric_spec = {
+    "groups": build_demographic_groups(wages_data_mapper),
+    "comparisons": demographic_comparisons,
+    "average_column": "{group}_Avg_Wage",
+    "gap_column": "{first}_vs_{second}_Wage_Gap",
+    "gap_percent_column": "{first}_vs_{second}_Wage_Gap_Percent",
+    # historical column names that don't follow the pattern
+    "column_overrides": {"White_Women_vs_Black_Women_Wage_Gap_Percent": "White_Women_vs_Black_Women_Gap_Percent"},
+}
+
+employment_metric_spec = {
+    "groups": build_demographic_groups(employment_data_mapper),
+    "comparisons": demographic_comparisons,
+    "average_column": "{group}_Avg_Employment_Ratio",
+    "gap_column": "{first}_vs_{second}_Employment_Gap",
+    "gap_percent_column": "{first}_vs_{second}_Employment_Gap_Percent",
+    "column_overrides": {},
+}
+
+def metric_column_names(spec):
+    overrides = spec.get("column_overrides", {})
+    average_columns = [spec["average_column"].format(group=group) for group in spec["groups"]]
+    gap_columns = [spec["gap_column"].format(first=first, second=second) for first, second in spec["comparisons"]]
+    gap_percent_columns = [spec["gap_percent_column"].format(first=first, second=second) for first, second in spec["comparisons"]]
+    return [overrides.get(col, col) for col in average_columns + gap_columns + gap_percent_columns]
+
+def compute_group_metric_arrays(values, group_members, comparison_pairs):
+
+    # values: rows x source columns, group_members: column positions per group,
+    # comparison_pairs: (first, second) group positions
+    rows, source_columns = values.shape
+    largest_group = max(len(members) for members in group_members)
+
+    # Gather every group into a rows x groups x members block, short groups are padded with a NaN column
+    padded = np.concatenate([values, np.full((rows, 1), np.nan)], axis=1)
+    member_index = np.full((len(group_members), largest_group), source_columns)
+    for position, members in enumerate(group_members):
+        member_index[position, :len(members)] = members
+    grouped = padded[:, member_index]
+
+    present = ~np.isnan(grouped)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.round(np.where(present, grouped, 0).sum(axis=2) / present.sum(axis=2), 2)
+
+        first = averages[:, [pair[0] for pair in comparison_pairs]]
+        second = averages[:, [pair[1] for pair in comparison_pairs]]
+        gaps = np.round(np.abs(first - second), 2)
+        gap_percents = np.round(gaps / ((first + second) / 2) * 100, 2)
+
+    return averages, gaps, gap_percents
+
+# Frames with at least this many rows get their metrics computed on one partition per core when partitions is None
+parallel_metric_minimum_rows = 500000
+
+# Rows per block on the serial path, only one block of inputs is converted to float64 at a time
+metric_block_rows = 65536
+
+def worker_process_pool(max_workers):
+    # forkserver workers start from a clean process, fork would copy the locks held by the DAG and prefetch threads
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+def compute_metric_partition(input_name, output_name, shape, output_columns, row_start, row_stop, group_members, comparison_pairs):
+
+    # Runs in a worker process: attach to the shared input/output blocks and fill this partition's rows in place
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    try:
+        values = np.ndarray(shape, dtype="float64", buffer=input_block.buf)
+        output = np.ndarray((shape[0], output_columns), dtype="float64", buffer=output_block.buf)
+        output[row_start:row_stop] = np.hstack(compute_group_metric_arrays(values[row_start:row_stop], group_members, comparison_pairs))
+        del values, output
+    finally:
+        input_block.close()
+        output_block.close()
+    return row_stop - row_start
+
+def year_range_boundaries(sorted_years, partitions):
+    # row offsets that split year-sorted rows into at most `partitions` contiguous year ranges
+    unique_years = np.unique(sorted_years)
+    first_years = [years[0] for years in np.array_split(unique_years, min(partitions, len(unique_years))) if len(years)]
+    return list(np.searchsorted(sorted_years, first_years, side="left")) + [len(sorted_years)]
+
+def compute_group_metric_arrays_parallel(values, years, group_members, comparison_pairs, partitions, max_workers = None):
+
+    # Rows are ordered by year and split into year ranges, one worker process per range.
+    # Inputs and outputs live in shared memory so no frame is pickled between processes.
+    order = np.argsort(years, kind="stable")
+    boundaries = year_range_boundaries(years[order], partitions)
+    output_columns = len(group_members) + 2 * len(comparison_pairs)
+
+    input_block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    output_block = shared_memory.SharedMemory(create=True, size=max(len(values) * output_columns * 8, 1))
+    try:
+        shared_values = np.ndarray(values.shape, dtype="float64", buffer=input_block.buf)
+        np.take(values, order, axis=0, out=shared_values)
+
+        with worker_process_pool(max_workers or len(boundaries) - 1) as executor:
+            futures = [executor.submit(compute_metric_partition, input_block.name, output_block.name, values.shape, output_columns,
+                                       int(start), int(stop), group_members, comparison_pairs)
+                       for start, stop in zip(boundaries[:-1], boundaries[1:])]
+            for future in futures:
+                future.result()
+
+        # scatter the year-ordered results back to the original row order
+        shared_output = np.ndarray((len(values), output_columns), dtype="float64", buffer=output_block.buf)
+        metrics = np.empty_like(shared_output)
+        metrics[order] = shared_output
+        del shared_values, shared_output
+    finally:
+        input_block.close()
+        input_block.unlink()
+        output_block.close()
+        output_block.unlink()
+
+    groups_count = len(group_members)
+    return metrics[:, :groups_count], metrics[:, groups_count:groups_count + len(comparison_pairs)], metrics[:, groups_count + len(comparison_pairs):]
+
+def apply_metric_spec(df, spec, partitions = None):
+
+    groups = spec["groups"]
+    group_names = list(groups)
+
+    source_columns = list(dict.fromkeys(col for members in groups.values() for col in members))
+    missing_columns = [col for col in source_columns if col not in df.columns]
+    if missing_columns:
+        sys.exit(f"Columns needed for the demographic metrics are missing: {', '.join(missing_columns)}. Pipeline terminated....")
+
+    column_position = {col: position for position, col in enumerate(source_columns)}
+    group_members = [[column_position[col] for col in members] for members in groups.values()]
+    comparison_pairs = [(group_names.index(first), group_names.index(second)) for first, second in spec["comparisons"]]
+
+    values = df[source_columns].to_numpy()
+    if partitions is None:
+        partitions = (os.cpu_count() or 1) if len(df) >= parallel_metric_minimum_rows else 1
+    if partitions > 1 and "year" in df.columns:
+        averages, gaps, gap_percents = compute_group_metric_arrays_parallel(values.astype("float64"), df["year"].to_numpy(), group_members, comparison_pairs, partitions)
+        metric_values = np.hstack([averages, gaps, gap_percents])
+    else:
+        # computed block by block and written straight into the result
+        metric_values = np.empty((len(df), len(group_members) + 2 * len(comparison_pairs)), dtype="float64")
+        for start in range(0, len(df), metric_block_rows):
+            block = values[start:start + metric_block_rows].astype("float64")
+            metric_values[start:start + len(block)] = np.hstack(compute_group_metric_arrays(block, group_members, comparison_pairs))
+
+    metrics = pd.DataFrame(metric_values, index=df.index, columns=metric_column_names(spec), copy=False)
+
+    # one concat instead of a column insertion per metric
+    return pd.concat([df, metrics], axis=1)
+
+imputation_strategies = ["mean", "median", "mode", "group_mean", "group_median", "interpolate"]
+
+# strategy the dataset transforms fill missing values with
+imputation_strategy = "mean"
+
+def interpolate_by_year(df, columns, order_by = "year", group_by = None):
+
+    # Linear interpolation along the year axis, missing edges take the nearest known value.
+    # group_by is one column or a list of them
+    ordered = df.sort_values(order_by, kind="stable")
+    values = ordered[columns].set_axis(ordered[order_by].to_numpy())
+
+    if group_by is None:
+        return values.interpolate(method="index", limit_direction="both").set_axis(ordered.index).reindex(df.index)
+
+    # every group is interpolated along its own years and its rows keep their labels
+    group_rows = ordered.groupby([group_by] if isinstance(group_by, str) else group_by, sort=False, observed=True, dropna=False).indices
+    if not group_rows:
+        return values.set_axis(ordered.index).reindex(df.index)
+    interpolated = pd.concat([values.iloc[rows].interpolate(method="index", limit_direction="both").set_axis(ordered.index[rows])
+                              for rows in group_rows.values()])
+    return interpolated.reindex(df.index)
+
+def impute_missing_values(df, columns = None, strategy = "mean", strategy_map = None, group_by = None, order_by = "year"):
+
+    if columns is None:
+        columns = list(df.columns)
+    if strategy_map is None:
+        strategy_map = {}
+
+    #1. Resolve the strategy of every target column
+    columns_by_strategy = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        col_strategy = strategy_map.get(col, strategy)
+        if col_strategy not in imputation_strategies:
+            print(f"Invalid Strategy '{col_strategy}' given for {col}... Using {strategy} instead")
+            col_strategy = strategy
+        if col_strategy.startswith("group_") and group_by is None:
+            print(f"No group column given for {col_strategy}... Using {col_strategy[len('group_'):]} instead")
+            col_strategy = col_strategy[len("group_"):]
+        columns_by_strategy.setdefault(col_strategy, []).append(col)
+
+    #2. Statistics for all columns of a strategy are computed in one vectorized pass
+    scalar_fill_values = {}
+    frame_fill_values = []
+    for col_strategy, strategy_columns in columns_by_strategy.items():
+        if col_strategy == "mean":
+            scalar_fill_values.update(df[strategy_columns].mean(numeric_only=True).to_dict())
+        elif col_strategy == "median":
+            scalar_fill_values.update(df[strategy_columns].median(numeric_only=True).to_dict())
+        elif col_strategy == "mode":
+            modes = df[strategy_columns].mode()
+            if not modes.empty:
+                scalar_fill_values.update(modes.iloc[0].to_dict())
+        elif col_strategy == "group_mean":
+            frame_fill_values.append(df.groupby(group_by, observed=True)[strategy_columns].transform("mean"))
+        elif col_strategy == "group_median":
+            frame_fill_values.append(df.groupby(group_by, observed=True)[strategy_columns].transform("median"))
+        elif col_strategy == "interpolate":
+            frame_fill_values.append(interpolate_by_year(df, strategy_columns, order_by, group_by))
+
+    #3. One fill for the scalar statistics and one for the row-wise ones
+    if scalar_fill_values:
+        df.fillna(scalar_fill_values, inplace=True)
+    if frame_fill_values:
+        df.fillna(pd.concat(frame_fill_values, axis=1), inplace=True)
+
+    return df
+
+def fill_missing_values(df, columns, strategy = "mean"):
+
+    if strategy not in imputation_strategies:
+        print("Invalid Strategy given in argument... Using mean as default")
+        strategy = "mean"
+
+    return impute_missing_values(df, columns, strategy)
+
+def fill_missing_values_excluding_columns(df, exclude_columns = [], strategy = "mean", strategy_map = None, group_by = None):
+
+    if strategy not in imputation_strategies:
+        print("Invalid Strategy given in argument... Using mean as default")
+        return df
+
+    columns_to_fill = [col for col in df.columns if col not in exclude_columns]
+    
+    return impute_missing_values(df, columns_to_fill, strategy, strategy_map, group_by)
+
+def drop_duplicates(df, columns_subset = None):
+    # the frame is returned as is when nothing is duplicated instead of being copied row by row
+    duplicated_rows = df.duplicated(subset = columns_subset)
+    return df[~duplicated_rows] if duplicated_rows.any() else df
+
+# Inputs above this many rows are joined with the hash partitioned strategy when strategy="auto"
+hash_join_minimum_rows = 1000000
+
+def resolve_join_keys(left, right, join_keys = None):
+    if join_keys is None:
+        join_keys = ["year"] + [col for col in dimension_columns if col in left.columns and col in right.columns]
+    missing_keys = [col for col in join_keys if col not in left.columns or col not in right.columns]
+    if missing_keys:
+        sys.exit(f"Join key(s) {', '.join(missing_keys)} missing from one of the datasets. Exiting pipeline...")
+    return join_keys
+
+def factorize_join_keys(left, right, join_keys):
+
+    # one shared integer code per key combination, ordered like the key values so sorted inputs give sorted codes
+    combined = pd.concat([left[join_keys], right[join_keys]], ignore_index=True)
+    if len(join_keys) == 1:
+        codes = pd.factorize(combined[join_keys[0]], sort=True, use_na_sentinel=False)[0]
+    else:
+        codes = combined.groupby(join_keys, sort=True, dropna=False, observed=True).ngroup().to_numpy()
+    return codes[:len(left)], codes[len(left):]
+
+def match_join_codes(left_codes, right_codes):
+
+    # Sort-merge on the key codes: the right side is sorted once (skipped when already sorted),
+    # then every left key finds its run of matching right rows by binary search
+    if len(right_codes) == 0 or np.all(right_codes[:-1] <= right_codes[1:]):
+        right_order = np.arange(len(right_codes))
+    else:
+        right_order = np.argsort(right_codes, kind="stable")
+    sorted_right_codes = right_codes[right_order]
+
+    starts = np.searchsorted(sorted_right_codes, left_codes, side="left")
+    counts = np.searchsorted(sorted_right_codes, left_codes, side="right") - starts
+
+    left_index = np.repeat(np.arange(len(left_codes)), counts)
+    run_offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right_index = right_order[np.repeat(starts, counts) + run_offsets]
+    return left_index, right_index
+
+def hash_partition_match(left_codes, right_codes, partitions, max_workers = None):
+
+    # Rows are partitioned by key code, each partition is matched in its own worker process.
+    # Only the integer key codes travel to the workers, never the frames themselves.
+    left_partitions = left_codes % partitions
+    right_partitions = right_codes % partitions
+    partition_rows = [(np.flatnonzero(left_partitions == p), np.flatnonzero(right_partitions == p)) for p in range(partitions)]
+
+    with worker_process_pool(max_workers or min(partitions, os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(match_join_codes, left_codes[left_rows], right_codes[right_rows]) for left_rows, right_rows in partition_rows]
+        matches = [future.result() for future in futures]
+
+    left_index = np.concatenate([left_rows[local_left] for (left_rows, _), (local_left, _) in zip(partition_rows, matches)])
+    right_index = np.concatenate([right_rows[local_right] for (_, right_rows), (_, local_right) in zip(partition_rows, matches)])
+
+    # back to left row order, like the sort-merge result
+    order = np.argsort(left_index, kind="stable")
+    return left_index[order], right_index[order]
+
+def join_cardinality(left_codes, right_codes, output_rows):
+    left_keys = np.unique(left_codes)
+    right_keys = np.unique(right_codes)
+    matched_keys = np.intersect1d(left_keys, right_keys, assume_unique=True)
+    return {
+        "left_rows": int(len(left_codes)),
+        "right_rows": int(len(right_codes)),
+        "output_rows": int(output_rows),
+        "matched_keys": int(len(matched_keys)),
+        "left_unmatched_keys": int(len(left_keys) - len(matched_keys)),
+        "right_unmatched_keys": int(len(right_keys) - len(matched_keys)),
+        "left_unmatched_rows": int((~np.isin(left_codes, matched_keys)).sum()),
+        "right_unmatched_rows": int((~np.isin(right_codes, matched_keys)).sum()),
+    }
+
+def join_data_sets(left, right, join_keys = None, strategy = "auto", partitions = 4, max_workers = None):
+
+    join_keys = resolve_join_keys(left, right, join_keys)
+    left_codes, right_codes = factorize_join_keys(left, right, join_keys)
+
+    if strategy == "auto":
+        strategy = "hash" if max(len(left), len(right)) >= hash_join_minimum_rows else "sort_merge"
+    if strategy == "hash":
+        left_index, right_index = hash_partition_match(left_codes, right_codes, partitions, max_workers)
+    elif strategy == "sort_merge":
+        left_index, right_index = match_join_codes(left_codes, right_codes)
+    else:
+        sys.exit(f"Unknown join strategy '{strategy}'. Use auto, sort_merge or hash.")
+
+    # Inner join result: left columns, then the right non-key columns (clashing names get _x/_y like pd.merge)
+    right_columns = [col for col in right.columns if col not in join_keys]
+    overlapping = [col for col in right_columns if col in left.columns]
+    left_part = left.take(left_index).rename(columns={col: f"{col}_x" for col in overlapping}).reset_index(drop=True)
+    right_part = right[right_columns].take(right_index).rename(columns={col: f"{col}_y" for col in overlapping}).reset_index(drop=True)
+    joined = pd.concat([left_part, right_part], axis=1)
+
+    return joined, join_cardinality(left_codes, right_codes, len(joined))
+
+def merge_data_sets(wages_data_transformed, employment_data_transformed, join_keys = None, strategy = "auto"):
+
+    # if on or both datasets are empty
+    if wages_data_transformed.empty or employment_data_transformed.empty:
+        sys.exit("Cannot merge the given datasets as one or both are empty. Please verify the previous steps /n Exiting pipeline...")
+
+    try:
+        merged, cardinality = join_data_sets(wages_data_transformed, employment_data_transformed, join_keys, strategy)
+    except Exception as e:
+        sys.exit("Unknown error occurred while merging datasets. Pipeline terminated...")
+
+    print(f"Join cardinality: {cardinality['output_rows']} rows, {cardinality['matched_keys']} matched keys, "
+          f"{cardinality['left_unmatched_keys']} wages-only keys ({cardinality['left_unmatched_rows']} rows), "
+          f"{cardinality['right_unmatched_keys']} employment-only keys ({cardinality['right_unmatched_rows']} rows)")
+    if cardinality["left_unmatched_rows"] or cardinality["right_unmatched_rows"]:
+        print("Warning: some rows have no match in the other dataset and are dropped by the merge")
+
+    return merged
+
+def drop_columns(df, columns_to_drop = []):
+    return df.drop(columns=columns_to_drop)
+    
+def select_wages_columns(wages_data, warn_missing_columns = True):
+
+    # Check if year column exists
+    if 'year' not in wages_data.columns:
+        sys.exit("Year column is missing from the data. Pipeline terminated....")
+
+    #1. Keep only the columns named in the mapper (ingestion normally prunes to these already), in source order
+    wages_data_columns_to_keep = ['year'] + [col for col in dimension_columns if col in wages_data.columns] + [col for col in wages_data.columns if col in wages_data_mapper]
+
+    # one selection for rows and columns, rows are only copied when an excluded year is present
+    excluded_years = wages_data["year"].isin(wages_years_to_remove)
+    if excluded_years.any():
+        wages_data = wages_data.loc[~excluded_years, wages_data_columns_to_keep]
+    else:
+        wages_data = wages_data[wages_data_columns_to_keep]
+
+    #2. Renaming columns
+
+    # Filter the mapping to only include columns that exist in the dataset
+    existing_columns_mapper = {old_col: new_col for old_col, new_col in wages_data_mapper.items() if old_col in wages_data.columns}
+
+    # Check if any columns are skipped
+    if len(existing_columns_mapper) < len(wages_data_mapper):
+        missing_columns = set(wages_data_mapper.keys()) - set(existing_columns_mapper.keys())
+        if warn_missing_columns:
+            print(f"Warning: Skipped the following columns as they dont exist: {', '.join(missing_columns)}")
+
+    return wages_data.rename(columns = wages_data_mapper)
+
+def transform_wages_data_set(wages_data, metric_partitions = None):
+
+    # Check if wages data is not empty
+    if wages_data.empty:
+        sys.exit("Wages Dataset is empty. Cannot continue the pipeline...")
+
+    #1-2. Keep and rename the mapped columns, drop the excluded years
+    wages_data = select_wages_columns(wages_data)
+    
+    #3. Remove duplicates 
+    wages_data = drop_duplicates(wages_data)
+
+    #4. fill na values with imputation strategy defined by user, default = "mean"
+    wages_data = fill_missing_values_excluding_columns(wages_data, ["year"] + dimension_columns, imputation_strategy,
+                                                       group_by=frame_dimension_columns(wages_data))
+
+
+    #5. Adding new columns - average hourly wage per demographic group, and the gaps between groups
+    wages_data = apply_metric_spec(wages_data, wages_metric_spec, metric_partitions)
+
+    # white_columns = ['White_Less_HS_Hourly_Wage', 'White_HS_Hourly_Wage', 'White_Some_College_Hourly_Wage',
+    #              'White_Bachelors_Hourly_Wage', 'White_Advanced_Hourly_Wage']
+    # wages_data['White_People_Average_Hourly_Wage'] = wages_data[white_columns].mean(axis=1)
+
+    # black_columns = ['Black_Less_HS_Hourly_Wage', 'Black_HS_Hourly_Wage', 'Black_Some_College_Hourly_Wage',
+    #              'Black_Bachelors_Hourly_Wage', 'Black_Advanced_Hourly_Wage']
+    # wages_data['Black_People_Average_Hourly_Wage'] = wages_data[black_columns].mean(axis=1)
+
+    # wages_data['Black_People_Average_Hourly_Wage'] = wages_data['Black_People_Average_Hourly_Wage'].round(2)
+    # wages_data['White_People_Average_Hourly_Wage'] = wages_data['White_People_Average_Hourly_Wage'].round(2)
+    
+    return wages_data
+
+
+def select_employment_columns(employment_data, warn_missing_columns = True):
+
+    #1. Keep only the columns named in the mapper (ingestion normally prunes to these already), in source order
+    employment_data_to_keep = ['year'] + [col for col in dimension_columns if col in employment_data.columns] + ['total_population'] + [col for col in employment_data.columns if col in employment_data_mapper]
+    employment_data = employment_data[employment_data_to_keep]
+
+
+    #2. Renaming columns
+
     # Filter the mapping to only include columns that exist in the dataset
     existing_columns_mapper = {old_col: new_col for old_col, new_col in employment_data_mapper.items() if old_col in employment_data.columns}
 
     # Check if any columns are skipped
     if len(existing_columns_mapper) < len(employment_data_mapper):
         missing_columns = set(employment_data_mapper.keys()) - set(existing_columns_mapper.keys())
-        print(f"Warning: Skipped the following columns as they dont exist: {', '.join(missing_columns)}")
+        if warn_missing_columns:
+            print(f"Warning: Skipped the following columns as they dont exist: {', '.join(missing_columns)}")
 
-    employment_data = employment_data.rename(columns = employment_data_mapper)
+    return employment_data.rename(columns = employment_data_mapper)
+
+def transform_employment_data_set(employment_data, metric_partitions = None):
+
+    # Check if wages data is not empty
+    if employment_data.empty:
+        sys.exit("Employment Dataset is empty. Cannot continue the pipeline...")
+
+    #1-2. Keep and rename the mapped columns
+    employment_data = select_employment_columns(employment_data)
 
     #3. Remove duplicates 
     employment_data = drop_duplicates(employment_data)
 
     #4. fill na values with imputation strategy defined by user, default = "mean"
-    employment_data = fill_missing_values_excluding_columns(employment_data, ["year","total_population"], "mean")
-
-    white_men_cols = [
-    'White_Men_Employment_Ratio_Less_Than_High_School', 
-    'White_Men_Employment_Ratio_High_School',
-    'White_Men_Employment_Ratio_Some_College', 
-    'White_Men_Employment_Ratio_Bachelors_Degree',
-    'White_Men_Employment_Ratio_Advanced_Degree'
-    ]
-
-    black_men_cols = [
-    'Black_Men_Employment_Ratio_Less_Than_High_School', 
-    'Black_Men_Employment_Ratio_High_School',
-    'Black_Men_Employment_Ratio_Some_College', 
-    'Black_Men_Employment_Ratio_Bachelors_Degree',
-    'Black_Men_Employment_Ratio_Advanced_Degree'
-        ]
+    employment_data = fill_missing_values_excluding_columns(employment_data, ["year","total_population"] + dimension_columns, imputation_strategy,
+                                                            group_by=frame_dimension_columns(employment_data))
 
-    white_women_cols = [
-    'White_Women_Employment_Ratio_Less_Than_High_School', 
-    'White_Women_Employment_Ratio_High_School',
-    'White_Women_Employment_Ratio_Some_College', 
-    'White_Women_Employment_Ratio_Bachelors_Degree',
-    'White_Women_Employment_Ratio_Advanced_Degree'
-    ]
-
-    black_women_cols = [
-    'Black_Women_Employment_Ratio_Less_Than_High_School', 
-    'Black_Women_Employment_Ratio_High_School',
-    'Black_Women_Employment_Ratio_Some_College', 
-    'Black_Women_Employment_Ratio_Bachelors_Degree',
-    'Black_Women_Employment_Ratio_Advanced_Degree'
-    ]
-
-    employment_data['White_Men_Avg_Employment_Ratio'] = employment_data[white_men_cols].mean(axis=1).round(2)
-    employment_data['Black_Men_Avg_Employment_Ratio'] = employment_data[black_men_cols].mean(axis=1).round(2)
-    employment_data['White_Women_Avg_Employment_Ratio'] = employment_data[white_women_cols].mean(axis=1).round(2)
-    employment_data['Black_Women_Avg_Employment_Ratio'] = employment_data[black_women_cols].mean(axis=1).round(2)
-
-    employment_data['White_Men_vs_Black_Men_Employment_Gap'] = abs(employment_data['White_Men_Avg_Employment_Ratio'] - employment_data['Black_Men_Avg_Employment_Ratio']).round(2)
-    employment_data['White_Women_vs_Black_Women_Employment_Gap'] = abs(employment_data['White_Women_Avg_Employment_Ratio'] - employment_data['Black_Women_Avg_Employment_Ratio']).round(2)
-
-    employment_data['White_Men_vs_White_Women_Employment_Gap'] = abs(employment_data['White_Men_Avg_Employment_Ratio'] - employment_data['White_Women_Avg_Employment_Ratio']).round(2)
-    employment_data['Black_Men_vs_Black_Women_Employment_Gap'] = abs(employment_data['Black_Men_Avg_Employment_Ratio'] - employment_data['Black_Women_Avg_Employment_Ratio']).round(2)
-
-    # # Percentage Difference
-    employment_data['White_Men_vs_Black_Men_Employment_Gap_Percent'] = ((
-        employment_data['White_Men_vs_Black_Men_Employment_Gap'] / ((employment_data['White_Men_Avg_Employment_Ratio'] + employment_data['Black_Men_Avg_Employment_Ratio']) / 2) 
-    ) * 100).round(2)
-
-    employment_data['White_Women_vs_Black_Women_Employment_Gap_Percent'] = ((
-        employment_data['White_Women_vs_Black_Women_Employment_Gap'] / ((employment_data['White_Women_Avg_Employment_Ratio'] + employment_data['Black_Women_Avg_Employment_Ratio']) / 2) 
-    ) * 100).round(2)
-
-    employment_data['White_Men_vs_White_Women_Employment_Gap_Percent'] = ((
-        employment_data['White_Men_vs_White_Women_Employment_Gap'] / ((employment_data['White_Men_Avg_Employment_Ratio'] + employment_data['White_Women_Avg_Employment_Ratio']) / 2) 
-    ) * 100).round(2)
-
-    employment_data['Black_Men_vs_Black_Women_Employment_Gap_Percent'] = ((
-        employment_data['Black_Men_vs_Black_Women_Employment_Gap'] / ((employment_data['Black_Men_Avg_Employment_Ratio'] + employment_data['Black_Women_Avg_Employment_Ratio']) / 2) 
-    ) * 100).round(2)
+    #5. Adding new columns - average employment ratio per demographic group, and the gaps between groups
+    employment_data = apply_metric_spec(employment_data, employment_metric_spec, metric_partitions)
 
     return employment_data
 
 def merged_data_set_transformation(df):
-    #6. changing dtype of year fields and other to 'int16' and 'float32' for efficient memory storage
+    # the merged frame is a shared DAG output (and stored artifact), the steps below work on a shallow copy of it
+    df = df.copy(deep=False)
+
+    #6. year back to 'int16' in case the merge widened it
     df["year"] = df["year"].astype("int16")
-    
-        
-    #7. Reorder columns, moving total population to second position
-    if "total_population" in df.columns:
-        cols = list(df.columns)
-        cols.remove("total_population")  
-        cols.insert(1, "total_population") 
-        df = df[cols]
 
-    #8. sort dataframe by year
-    df.sort_values(by='year', ascending=False, inplace=True)
+    #7. Reorder columns, moving total population to second position (moved in place, a reorder would copy every metric column)
+    if "total_population" in df.columns:
+        df.insert(1, "total_population", df.pop("total_population"))
 
-    return  df
+    #8. sort dataframe by year, regions in order within a year
+    key_columns = frame_key_columns(df)
+    return df.sort_values(by=key_columns, ascending=[False] + [True] * (len(key_columns) - 1))
 # -----------------TRANSFORM-----------------#
 
 # -----------------LOAD-----------------#
-def load_datasets(df):
+output_table_name = 'wages_and_employment_ratio_by_education'
+output_database_name = 'wages_and_employment_data.db'
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def dataframe_rows(df):
+    # plain python values for sqlite3, NaN becomes NULL
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+def row_hashes(df):
+    # 64 bit hash per row over all values, stored as signed INTEGER in SQLite
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().view("int64")
+
+def row_hash_table_name(table_name):
+    # per-row hashes of the last incremental load, any other write to the table makes them stale
+    return f"{table_name}_row_hashes"
+
+def table_exists(conn, table_name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone() is not None
+
+def sqlite_column_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+def build_table_ddl(df, table_name, not_null_columns = ["year"]):
+    # explicit schema from the frame dtypes instead of the loose one pandas infers
+    column_definitions = []
+    for col, dtype in df.dtypes.items():
+        definition = f"{quote_identifier(col)} {sqlite_column_type(dtype)}"
+        if col in not_null_columns:
+            definition += " NOT NULL"
+        column_definitions.append(definition)
+    return f"CREATE TABLE {quote_identifier(table_name)} ({', '.join(column_definitions)})"
+
+# synchronous is only relaxed while loading, WAL stays on so dashboards can read during reloads
+bulk_load_pragmas = {"synchronous": "OFF", "cache_size": -64000, "temp_store": "MEMORY"}
+
+def apply_bulk_load_pragmas(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    previous_pragmas = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in bulk_load_pragmas}
+    for name, value in bulk_load_pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return previous_pragmas
+
+def restore_pragmas(conn, previous_pragmas):
+    for name, value in previous_pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+
+def insert_rows_chunked(conn, df, table_name, chunk_size = 10000):
+    columns_sql = ", ".join(quote_identifier(col) for col in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    insert_sql = f"INSERT INTO {quote_identifier(table_name)} ({columns_sql}) VALUES ({placeholders})"
+    for start in range(0, len(df), chunk_size):
+        conn.executemany(insert_sql, dataframe_rows(df.iloc[start:start + chunk_size]))
+
+def create_indexes(conn, table_name, index_columns):
+    for col in index_columns:
+        index_name = quote_identifier(f"ix_{table_name}_{col}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {quote_identifier(table_name)} ({quote_identifier(col)})")
+
+def load_datasets_replace(conn, df, table_name = output_table_name, index_columns = ["year"], chunk_size = 10000):
+
+    # Drop, create, bulk insert and index in one transaction, WAL readers keep seeing the old table until commit
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(row_hash_table_name(table_name))}")
+        conn.execute(build_table_ddl(df, table_name))
+        insert_rows_chunked(conn, df, table_name, chunk_size)
+        create_indexes(conn, table_name, [col for col in index_columns if col in df.columns])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # fresh planner statistics for the new table and indexes
+    conn.execute(f"ANALYZE {quote_identifier(table_name)}")
+    print(f"Bulk load: {len(df)} rows written to {table_name}")
+
+def load_datasets_incremental(conn, df, table_name = output_table_name, key_columns = None):
+
+    if key_columns is None:
+        key_columns = frame_key_columns(df)
+    hash_table_name = row_hash_table_name(table_name)
+    keys_sql = ", ".join(quote_identifier(col) for col in key_columns)
+
+    #1. Make sure the target table, its unique key index and the row hash table exist
+    if not table_exists(conn, table_name):
+        conn.execute(build_table_ddl(df, table_name, key_columns))
+    existing_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
+    for col in df.columns:
+        if col not in existing_columns:
+            conn.execute(f"ALTER TABLE {quote_identifier(table_name)} ADD COLUMN {quote_identifier(col)} {sqlite_column_type(df[col].dtype)}")
+
+    # a unique index or hash table over an older key (e.g. year before region was a dimension) would collapse rows
+    index_name = f"ux_{table_name}_{'_'.join(key_columns)}"
+    for row in conn.execute(f"PRAGMA index_list({quote_identifier(table_name)})").fetchall():
+        if row[2] and row[3] == "c" and row[1].startswith(f"ux_{table_name}_") and row[1] != index_name:
+            conn.execute(f"DROP INDEX {quote_identifier(row[1])}")
+    if table_exists(conn, hash_table_name) and [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(hash_table_name)})")] != key_columns + ["row_hash"]:
+        conn.execute(f"DROP TABLE {quote_identifier(hash_table_name)}")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {quote_identifier(index_name)} ON {quote_identifier(table_name)} ({keys_sql})")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {quote_identifier(hash_table_name)} ({keys_sql}, row_hash INTEGER NOT NULL, PRIMARY KEY ({keys_sql}))")
+
+    #2. Compare per-row hashes with the ones stored by the previous load
+    stored_hashes = pd.read_sql_query(f"SELECT {keys_sql}, row_hash AS stored_hash FROM {quote_identifier(hash_table_name)}", conn)
+    current_hashes = df[key_columns].assign(row_hash=row_hashes(df))
+    compared = current_hashes.merge(stored_hashes, on=key_columns, how="left")
+    changed_rows = (compared["row_hash"] != compared["stored_hash"]).to_numpy()
+
+    changed_df = df[changed_rows]
+    changed_hashes = current_hashes[changed_rows]
+
+    # keys in the table that the source no longer has, including rows written by other load modes
+    current_keys = set(dataframe_rows(df[key_columns]))
+    removed_keys = [key for key in conn.execute(f"SELECT DISTINCT {keys_sql} FROM {quote_identifier(table_name)}") if key not in current_keys]
+
+    #3. Upsert only the changed rows, all in one transaction
+    columns_sql = ", ".join(quote_identifier(col) for col in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    update_sql = ", ".join(f"{quote_identifier(col)} = excluded.{quote_identifier(col)}" for col in df.columns if col not in key_columns)
+    upsert_sql = (f"INSERT INTO {quote_identifier(table_name)} ({columns_sql}) VALUES ({placeholders}) "
+                  f"ON CONFLICT ({keys_sql}) DO " + (f"UPDATE SET {update_sql}" if update_sql else "NOTHING"))
+    hash_upsert_sql = (f"INSERT INTO {quote_identifier(hash_table_name)} ({keys_sql}, row_hash) VALUES ({', '.join('?' for _ in key_columns)}, ?) "
+                       f"ON CONFLICT ({keys_sql}) DO UPDATE SET row_hash = excluded.row_hash")
+
+    key_match_sql = " AND ".join(f"{quote_identifier(col)} IS ?" for col in key_columns)
+
+    with conn:
+        conn.executemany(upsert_sql, dataframe_rows(changed_df))
+        conn.executemany(hash_upsert_sql, dataframe_rows(changed_hashes))
+        conn.executemany(f"DELETE FROM {quote_identifier(table_name)} WHERE {key_match_sql}", removed_keys)
+        conn.executemany(f"DELETE FROM {quote_identifier(hash_table_name)} WHERE {key_match_sql}", removed_keys)
+
+    print(f"Incremental load: {len(changed_df)} of {len(df)} rows changed, {len(removed_keys)} removed")
+    return len(changed_df)
+
+def replace_tables(conn, tables):
+    # every table of the dict (name -> frame) is replaced in one transaction
+    conn.execute("BEGIN")
+    try:
+        for table_name, df in tables.items():
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+            conn.execute(build_table_ddl(df, table_name))
+            insert_rows_chunked(conn, df, table_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Per-year and per-decade averages of every numeric column, rebuilt by each load for the query module.
+# Like the analytics, a summary row averages all regions of its period, row_count is the number of rows behind it
+summary_periods = {"yearly": "year", "decade": "(year / 10) * 10"}
+
+def summary_table_name(table_name, period):
+    return f"{table_name}_{period}"
+
+def build_summary_tables(conn, table_name = output_table_name):
+
+    numeric_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+                       if row[2] in ("REAL", "INTEGER") and row[1] != "year" and row[1] not in dimension_columns]
+    averages_sql = "".join(f", AVG({quote_identifier(col)}) AS {quote_identifier(col)}" for col in numeric_columns)
+
+    # rebuilt in one transaction so readers see either the old or the new summaries
+    conn.execute("BEGIN")
+    try:
+        for period, period_sql in summary_periods.items():
+            summary_name = summary_table_name(table_name, period)
+            period_column = "year" if period == "yearly" else period
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(summary_name)}")
+            conn.execute(f"CREATE TABLE {quote_identifier(summary_name)} AS SELECT {period_sql} AS {quote_identifier(period_column)}, "
+                         f"COUNT(*) AS row_count{averages_sql} FROM {quote_identifier(table_name)} GROUP BY 1 ORDER BY 1")
+            conn.execute(f"CREATE UNIQUE INDEX {quote_identifier('ux_' + summary_name)} ON {quote_identifier(summary_name)} ({quote_identifier(period_column)})")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"Summary tables rebuilt for {table_name}: {', '.join(summary_table_name(table_name, period) for period in summary_periods)}")
+
+# Swap publishing: a load builds the next version of the output table, its summaries and analytics under <table>__v<N>,
+# checks it and renames it in place of the live tables in one transaction. Older versions stay for instant rollback.
+# The quarantine table is a log of every run and is not versioned
+published_versions_kept = 3
+
+def versions_table_name(table_name):
+    return f"{table_name}_versions"
+
+def version_table_name(table_name, version):
+    return f"{table_name}__v{version}"
+
+def published_table_names(table_name):
+    # the output table, then <table>_<suffix> for the summaries and the analytics
+    return [table_name] + [f"{table_name}_{suffix}" for suffix in list(summary_periods) + list(analytics_tables)]
+
+def table_columns(conn, table_name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
+
+def live_version(conn, table_name):
+    row = conn.execute(f"SELECT version FROM {quote_identifier(versions_table_name(table_name))} WHERE live = 1").fetchone()
+    return row[0] if row else None
+
+def kept_versions(conn, table_name):
+    # archived versions, newest first
+    return [version for (version,) in conn.execute(f"SELECT version FROM {quote_identifier(versions_table_name(table_name))} "
+                                                   f"WHERE live = 0 ORDER BY version DESC")]
+
+def rename_table(conn, table_name, new_name, move_indexes = False):
+    # Indexes keep their names through a rename. When a live table is archived, indexes named after the live name
+    # (left by a replace or incremental load) are recreated under the new name so the next load can create its own
+    indexes = [(row[1], row[2]) for row in conn.execute(f"PRAGMA index_list({quote_identifier(table_name)})") if row[3] == "c"]
+    conn.execute(f"ALTER TABLE {quote_identifier(table_name)} RENAME TO {quote_identifier(new_name)}")
+    for index_name, unique in indexes:
+        if not move_indexes or new_name in index_name:
+            continue
+        columns_sql = ", ".join(quote_identifier(row[2]) for row in conn.execute(f"PRAGMA index_info({quote_identifier(index_name)})"))
+        conn.execute(f"DROP INDEX {quote_identifier(index_name)}")
+        conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {quote_identifier(index_name.replace(table_name, new_name, 1))} "
+                     f"ON {quote_identifier(new_name)} ({columns_sql})")
+
+def drop_published_version(conn, table_name, version):
+    for name in published_table_names(version_table_name(table_name, version)):
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+
+def check_published_version(conn, df, version_name, extra_tables = None):
+    # the build is complete when every row, the year range and the summaries made it into the database
+    problems = []
+    if table_columns(conn, version_name) != list(df.columns):
+        problems.append("columns differ from the data set")
+    row_count, first_year, last_year = conn.execute(f"SELECT COUNT(*), MIN(year), MAX(year) FROM {quote_identifier(version_name)}").fetchone()
+    if row_count != len(df):
+        problems.append(f"{row_count} rows instead of {len(df)}")
+    if len(df) and (first_year, last_year) != (int(df["year"].min()), int(df["year"].max())):
+        problems.append(f"years {first_year}-{last_year} instead of {int(df['year'].min())}-{int(df['year'].max())}")
+    summarised_rows = conn.execute(f"SELECT SUM(row_count) FROM {quote_identifier(summary_table_name(version_name, 'yearly'))}").fetchone()[0] or 0
+    if summarised_rows != row_count:
+        problems.append(f"yearly summary covers {summarised_rows} of {row_count} rows")
+    for suffix, extra_df in (extra_tables or {}).items():
+        extra_rows = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(f'{version_name}_{suffix}')}").fetchone()[0]
+        if extra_rows != len(extra_df):
+            problems.append(f"{suffix} has {extra_rows} rows instead of {len(extra_df)}")
+    return problems
+
+def swap_published_version(conn, table_name, version):
+
+    # the live tables move to __v<live version> and the chosen version takes the live names, all in one transaction.
+    # WAL readers keep their snapshot and see either the old or the new tables, never a missing one
+    versions_table = quote_identifier(versions_table_name(table_name))
+    current_version = live_version(conn, table_name)
+    archived_names = published_table_names(version_table_name(table_name, current_version)) if current_version is not None else None
+    conn.execute("BEGIN")
+    try:
+        for position, (live_name, version_name) in enumerate(zip(published_table_names(table_name), published_table_names(version_table_name(table_name, version)))):
+            if archived_names is not None and table_exists(conn, live_name):
+                rename_table(conn, live_name, archived_names[position], move_indexes=True)
+            else:
+                conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(live_name)}")
+            # a version built without analytics leaves them out instead of keeping ones that describe other data
+            if table_exists(conn, version_name):
+                rename_table(conn, version_name, live_name)
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(row_hash_table_name(table_name))}")
+        conn.execute(f"UPDATE {versions_table} SET live = (version = ?), "
+                     f"published_at = CASE WHEN version = ? THEN ? ELSE published_at END", (version, version, datetime.now(timezone.utc).isoformat()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return current_version
+
+def prune_published_versions(conn, table_name, keep = None):
+    if keep is None:
+        keep = published_versions_kept
+    conn.execute("BEGIN")
+    try:
+        for version in kept_versions(conn, table_name)[keep:]:
+            drop_published_version(conn, table_name, version)
+            conn.execute(f"DELETE FROM {quote_identifier(versions_table_name(table_name))} WHERE version = ?", (version,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def load_datasets_swap(conn, df, table_name = output_table_name, index_columns = ["year"], keep = None, extra_tables = None):
+
+    # The build shares the file with the live tables and its checkpoints rewrite shared pages (the schema),
+    # so the WAL is synced before every checkpoint for the whole load. An OS crash cannot corrupt the live tables
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    #1. Version bookkeeping, a live table written by an earlier replace or incremental load becomes a version of its own
+    versions_table = quote_identifier(versions_table_name(table_name))
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {versions_table} (version INTEGER PRIMARY KEY, built_at TEXT NOT NULL, "
+                 f"published_at TEXT, row_count INTEGER NOT NULL, live INTEGER NOT NULL DEFAULT 0)")
+    with conn:
+        if live_version(conn, table_name) is None and table_exists(conn, table_name):
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+            conn.execute(f"INSERT INTO {versions_table} (version, built_at, row_count, live) "
+                         f"VALUES (COALESCE((SELECT MAX(version) FROM {versions_table}), 0) + 1, ?, ?, 1)", (datetime.now(timezone.utc).isoformat(), row_count))
+    version = (conn.execute(f"SELECT MAX(version) FROM {versions_table}").fetchone()[0] or 0) + 1
+    version_name = version_table_name(table_name, version)
+
+    #2. Build the shadow tables next to the live ones, leftovers of a crashed build are dropped first
+    drop_published_version(conn, table_name, version)
+    load_datasets_replace(conn, df, version_name, index_columns)
+    build_summary_tables(conn, version_name)
+    if extra_tables:
+        replace_tables(conn, {f"{version_name}_{suffix}": extra_df for suffix, extra_df in extra_tables.items()})
+
+    #3. Check the build before anyone can see it, a bad build never replaces the live tables
+    problems = check_published_version(conn, df, version_name, extra_tables)
+    if problems:
+        drop_published_version(conn, table_name, version)
+        raise ValueError(f"Version {version} of {table_name} failed its checks: {'; '.join(problems)}")
+
+    #4. Register, swap in and keep the last versions for rollback
+    with conn:
+        conn.execute(f"INSERT INTO {versions_table} (version, built_at, row_count) VALUES (?, ?, ?)", (version, datetime.now(timezone.utc).isoformat(), len(df)))
+    previous_version = swap_published_version(conn, table_name, version)
+    prune_published_versions(conn, table_name, keep)
+    print(f"Published version {version} of {table_name}" + (f", version {previous_version} kept for rollback" if previous_version is not None else ""))
+    return version
+
+def rollback_published_version(version = None, db_path = None, table_name = output_table_name):
+
+    if db_path is None:
+        db_path = os.path.join(parent_directory, 'data', output_database_name)
+    if not os.path.exists(db_path):
+        sys.exit(f"Database {db_path} does not exist. Nothing to roll back...")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if not table_exists(conn, versions_table_name(table_name)):
+            sys.exit(f"{table_name} has no published versions. Load it with --load-mode swap first...")
+        current_version = live_version(conn, table_name)
+        versions = kept_versions(conn, table_name)
+        # without a version the newest one older than the live version
+        if version is None:
+            older_versions = [kept for kept in versions if current_version is None or kept < current_version]
+            if not older_versions:
+                sys.exit(f"No earlier version of {table_name} is kept. Kept versions: {', '.join(map(str, versions)) or 'none'}")
+            version = older_versions[0]
+        elif version not in versions:
+            sys.exit(f"Version {version} of {table_name} is not kept. Kept versions: {', '.join(map(str, versions)) or 'none'}")
+        swap_published_version(conn, table_name, version)
+    finally:
+        conn.close()
+    print(f"Rolled back {table_name} from version {current_version} to version {version}")
+    return version
+
+def load_datasets(df, mode = "replace", db_path = None, index_columns = ["year"], extra_tables = None):
+    # extra_tables: frames by suffix (e.g. the analytics) written as <output table>_<suffix>, swap loads version them with the output table
     # script_dir = os.path.dirname(os.path.abspath(__file__))
     # parent_dir = os.path.dirname(script_dir)
     try:
         
-        data_dir = os.path.join(parent_directory, 'data')
-        db_path = os.path.join(data_dir, 'wages_and_employment_data.db')
+        if db_path is None:
+            data_dir = os.path.join(parent_directory, 'data')
+            db_path = os.path.join(data_dir, output_database_name)
         conn = sqlite3.connect(db_path)
-        df.to_sql('wages_and_employment_ratio_by_education', conn, if_exists='replace', index=False)
+        previous_pragmas = apply_bulk_load_pragmas(conn)
+        if mode == "swap":
+            load_datasets_swap(conn, df, index_columns=index_columns, extra_tables=extra_tables)
+        elif mode == "incremental":
+            load_datasets_incremental(conn, df)
+            build_summary_tables(conn)
+        else:
+            load_datasets_replace(conn, df, index_columns=index_columns)
+            build_summary_tables(conn)
+        if extra_tables and mode != "swap":
+            replace_tables(conn, {f"{output_table_name}_{suffix}": extra_df for suffix, extra_df in extra_tables.items()})
+        restore_pragmas(conn, previous_pragmas)
         conn.close()
         print("SQL file generated ")
     except Exception as e:
-        sys.exit("Unknown error occurred during loading dataset in database. Pipeline terminated!!!")
+        sys.exit(f"Unknown error occurred during loading dataset in database: {e}. Pipeline terminated!!!")
         
+output_parquet_directory_name = 'wages_and_employment_parquet'
+
+def load_datasets_parquet(df, output_path = None, compression = "zstd"):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("pyarrow is required for the parquet sink. Install it with: pip install pyarrow")
+
+    if output_path is None:
+        output_path = os.path.join(parent_directory, 'data', output_parquet_directory_name)
+
+    # one hive partition per decade, e.g. decade=1980/
+    table = pa.Table.from_pandas(df.assign(decade=(df["year"] // 10 * 10).astype("int16")), preserve_index=False)
+
+    # Build next to the live dataset and swap directories, readers never see a half written dataset
+    staging_path = output_path + ".staging"
+    previous_path = output_path + ".previous"
+    shutil.rmtree(staging_path, ignore_errors=True)
+    pq.write_to_dataset(table, root_path=staging_path, partition_cols=["decade"],
+                        compression=compression, write_statistics=True)
+
+    shutil.rmtree(previous_path, ignore_errors=True)
+    if os.path.exists(output_path):
+        os.replace(output_path, previous_path)
+    os.replace(staging_path, output_path)
+    shutil.rmtree(previous_path, ignore_errors=True)
+
+    print(f"Parquet dataset written to {output_path}")
+
+def read_parquet_columns(columns = None, start_year = None, end_year = None, dataset_path = None):
+    import pyarrow.parquet as pq
+
+    if dataset_path is None:
+        dataset_path = os.path.join(parent_directory, 'data', output_parquet_directory_name)
+
+    # decade filters prune whole partitions, year filters use the row group statistics
+    filters = []
+    if start_year is not None:
+        filters += [("decade", ">=", start_year // 10 * 10), ("year", ">=", start_year)]
+    if end_year is not None:
+        filters += [("decade", "<=", end_year // 10 * 10), ("year", "<=", end_year)]
+
+    table = pq.read_table(dataset_path, columns=columns, filters=filters or None, memory_map=True)
+    return table.to_pandas()
+
+# Output sinks by name, every sink takes the final frame plus its own keyword options
+output_sinks = {
+    "sqlite": load_datasets,
+    "parquet": load_datasets_parquet,
+}
+
+def write_to_sinks(df, sink_names = ["sqlite"], sink_options = None):
+    if sink_options is None:
+        sink_options = {}
+
+    unknown_sinks = [name for name in sink_names if name not in output_sinks]
+    if unknown_sinks:
+        sys.exit(f"Unknown output sink(s): {', '.join(unknown_sinks)}. Available: {', '.join(output_sinks)}")
+
+    for name in sink_names:
+        print(f"Writing to {name} sink...")
+        output_sinks[name](df, **sink_options.get(name, {}))
+
 # -----------------LOAD-----------------#
 
-def main():
-    print("\nETL Pipeline started...")
-    # Please sign into Kaggle -> Go to Settings
-    # Create API token -> place kaggle.json file into project directory
-    # Run the script
-    dataset_names = [
-    "asaniczka/wages-by-education-in-the-usa-1973-2022",
-    "asaniczka/employment-to-population-ratio-for-usa-1979-2023",
-    ]
+# -----------------VALIDATION-----------------#
+
+quarantine_table_name = output_table_name + "_quarantine"
+
+# Declared rules, checked on the transformed data set right before it is loaded.
+# range: min/max per column (nulls are left to the null rule), unique: key columns,
+# max_null_fraction: share of nulls a column may have before its null rows are quarantined
+validation_rules = [
+    {"name": "year_bounds", "check": "range", "columns": ["year"], "min": 1900, "max": datetime.now(timezone.utc).year},
+    {"name": "employment_ratio_range", "check": "range", "columns": list(employment_data_mapper.values()), "min": 0, "max": 100},
+    {"name": "non_negative_wages", "check": "range", "columns": list(wages_data_mapper.values()), "min": 0},
+    {"name": "unique_year", "check": "unique", "columns": ["year"] + dimension_columns},
+]
+
+# Checked on every extracted dataset before its transform, the transforms impute every null afterwards
+source_validation_rules = [
+    {"name": "null_fraction", "check": "max_null_fraction", "columns": list(wages_data_mapper.values()) + list(employment_data_mapper.values()), "max": 0.1},
+]
+
+def rule_failure_mask(df, rule):
+
+    # one boolean per row, every column of the rule is checked at once
+    columns = [col for col in rule["columns"] if col in df.columns]
+    if not columns:
+        return np.zeros(len(df), dtype=bool)
+
+    if rule["check"] == "range":
+        values = df[columns].to_numpy(dtype="float64")
+        failed = np.zeros(values.shape, dtype=bool)
+        if "min" in rule:
+            failed |= values < rule["min"]
+        if "max" in rule:
+            failed |= values > rule["max"]
+        return failed.any(axis=1)
+    if rule["check"] == "unique":
+        return df.duplicated(subset=columns, keep="first").to_numpy()
+    if rule["check"] == "max_null_fraction":
+        nulls = df[columns].isna().to_numpy()
+        over_limit = nulls.mean(axis=0) > rule["max"] if len(df) else np.zeros(len(columns), dtype=bool)
+        return nulls[:, over_limit].any(axis=1)
+    sys.exit(f"Unknown validation check '{rule['check']}' in rule {rule['name']}")
+
+def write_quarantine_rows(quarantined, db_path, table_name = quarantine_table_name):
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            if not table_exists(conn, table_name):
+                conn.execute(build_table_ddl(quarantined, table_name, not_null_columns=["failed_rule"]))
+            else:
+                # quarantined rows from runs with other columns still fit, new columns are added
+                existing_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")}
+                for col, dtype in quarantined.dtypes.items():
+                    if col not in existing_columns:
+                        conn.execute(f"ALTER TABLE {quote_identifier(table_name)} ADD COLUMN {quote_identifier(col)} {sqlite_column_type(dtype)}")
+            insert_rows_chunked(conn, quarantined, table_name)
+    finally:
+        conn.close()
 
-    print(f"Setting Up Kaggle API...")
-    setKaggleAPI()
-    print(f"Kaggle API Setup Done...\n")
+def validate_data_set(df, rules = None, quarantine_db_path = None, quarantine_table = quarantine_table_name):
+
+    if rules is None:
+        rules = validation_rules
+
+    # rows x rules failure matrix, built in a single pass over the frame
+    failures = np.column_stack([rule_failure_mask(df, rule) for rule in rules]) if rules else np.zeros((len(df), 0), dtype=bool)
+    failed_rows = failures.any(axis=1)
+
+    if not failed_rows.any():
+        print(f"Validation passed: all {len(df)} rows satisfy {len(rules)} rules")
+        return df
 
-    print(f"Extracting Wages Dataset...")
-    wage_by_education_dataset = data_sets_extraction(dataset_names[0])
-    print(f"Wages Dataset Extraction Done...\n")
+    rule_names = np.array([rule["name"] for rule in rules], dtype=object)
+    failure_counts = ", ".join(f"{name}: {count}" for name, count in zip(rule_names, failures.sum(axis=0)) if count)
+    print(f"Validation: {int(failed_rows.sum())} of {len(df)} rows failed and are quarantined ({failure_counts})")
 
-    print(f"Extracting Employment-To-Population Dataset...")
-    employment_to_population_dataset = data_sets_extraction(dataset_names[1])
-    print(f"Employment-To-Population Dataset Extraction Done...\n")
+    quarantined = df[failed_rows].assign(
+        failed_rule=[",".join(rule_names[row]) for row in failures[failed_rows]],
+        quarantined_at=datetime.now(timezone.utc).isoformat())
+    if quarantine_db_path is not None:
+        write_quarantine_rows(quarantined, quarantine_db_path, quarantine_table)
 
-    print(f"Zip Files of Datasets removed after extraction\n")
-    
-    print("Tranforming Datasets....")
+    return df[~failed_rows]
 
-    print(f"Transforming Wages Dataset...")
-    transformed_wages_data_set = transform_wages_data_set(wage_by_education_dataset)
-    print(transformed_wages_data_set.shape)
-    print(f"Wages Dataset Trasformation Done...\n")
+def validate_source_data_set(df, select_columns, rules = None, quarantine_db_path = None, quarantine_table = quarantine_table_name):
 
-    print(f"Transforming Employment-To_Population Dataset...")
-    transformed_employment_data_set = transform_employment_data_set(employment_to_population_dataset)
-    print(transformed_employment_data_set.shape)
-    print(f"Employment-To_Population Dataset Transformation Done...\n")
+    # rows are checked and quarantined with the selected, renamed columns (as in the output table),
+    # the raw rows that pass go on to the transform
+    if rules is None:
+        rules = source_validation_rules
+    selected = select_columns(df, warn_missing_columns=False)
+    failed_rows = selected.index.difference(validate_data_set(selected, rules, quarantine_db_path, quarantine_table).index)
+    return df.drop(index=failed_rows) if len(failed_rows) else df
 
-    print("Merging Both Datasets....")
-    merged_data_set = merge_data_sets(transformed_wages_data_set, transformed_employment_data_set)
-    final_transformed_data_set = merged_data_set_transformation(merged_data_set)
-    print(merged_data_set.shape)
-    print("Datasets Merged...\n")
+# -----------------VALIDATION-----------------#
 
-    print("Tranformation step completed.")
-    print("\n")
+# -----------------ANALYTICS-----------------#
+
+# Precomputed for the analysis notebook: year over year deltas, rolling means, linear trends and gap correlations
+analytics_rolling_window = 5
+
+analytics_tables = {
+    "yoy_deltas": output_table_name + "_yoy_deltas",
+    "rolling_means": output_table_name + "_rolling_means",
+    "trends": output_table_name + "_trends",
+    "gap_correlations": output_table_name + "_gap_correlations",
+}
+
+def yearly_metric_means(df):
+    # one row per year (regions averaged), every numeric column except year, in float64 for the statistics
+    metric_columns = [col for col in df.columns if col != "year" and col not in dimension_columns
+                      and pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    return df.groupby("year", observed=True, sort=True)[metric_columns].mean().astype("float64")
+
+def least_squares_trends(yearly):
+
+    # Lines for all metric columns at once: the 2x2 normal equations of every column are stacked and solved in one batched call.
+    # Years missing in a column drop out through its weights, so gaps don't force one fit per column.
+    years = yearly.index.to_numpy(dtype="float64")
+    centered_years = years - years.mean()
+    values = yearly.to_numpy(dtype="float64")
+    weights = (~np.isnan(values)).astype("float64")
+    observed = np.where(weights > 0, values, 0.0)
+
+    counts = weights.sum(axis=0)
+    sum_x = centered_years @ weights
+    sum_xx = (centered_years ** 2) @ weights
+    sum_y = observed.sum(axis=0)
+    sum_xy = centered_years @ observed
+
+    normal_matrices = np.stack([np.stack([counts, sum_x], axis=-1), np.stack([sum_x, sum_xx], axis=-1)], axis=1)
+    right_hand_sides = np.stack([sum_y, sum_xy], axis=-1)[..., np.newaxis]
+    solvable = (counts >= 2) & (counts * sum_xx - sum_x ** 2 > 1e-9)
+
+    coefficients = np.full((values.shape[1], 2), np.nan)
+    if solvable.any():
+        coefficients[solvable] = np.linalg.solve(normal_matrices[solvable], right_hand_sides[solvable])[..., 0]
+    centered_intercepts, slopes = coefficients[:, 0], coefficients[:, 1]
+
+    # goodness of fit over the years each column actually has
+    with np.errstate(invalid="ignore", divide="ignore"):
+        residuals = (observed - (centered_intercepts + np.outer(centered_years, slopes))) * weights
+        deviations = (observed - sum_y / counts) * weights
+        r_squared = 1 - (residuals ** 2).sum(axis=0) / (deviations ** 2).sum(axis=0)
+
+    return pd.DataFrame({
+        "metric": yearly.columns,
+        "slope": slopes,
+        "intercept": centered_intercepts - slopes * years.mean(),
+        "r_squared": np.where(solvable, r_squared, np.nan),
+        "years": counts.astype("int64"),
+    })
+
+def gap_metric_columns(spec):
+    # gap and gap percent columns of a metric spec (the averages come first in metric_column_names)
+    return metric_column_names(spec)[len(spec["groups"]):]
+
+def compute_analytics(df, rolling_window = None):
+
+    if rolling_window is None:
+        rolling_window = analytics_rolling_window
+
+    #1. Regions are averaged per year first, all statistics are on the yearly series
+    yearly = yearly_metric_means(df)
+
+    #2. Deltas to the previous available year and trailing rolling means
+    yoy_deltas = yearly.diff().reset_index()
+    rolling_means = yearly.rolling(rolling_window, min_periods=1).mean().reset_index()
+
+    #3. Slope and intercept of a least squares line per metric column
+    trends = least_squares_trends(yearly)
+
+    #4. Pairwise correlation of every wage and employment gap column
+    gap_columns = [col for col in gap_metric_columns(wages_metric_spec) + gap_metric_columns(employment_metric_spec) if col in yearly.columns]
+    gap_correlations = yearly[gap_columns].corr().rename_axis("metric").reset_index()
+
+    print(f"Analytics computed: {len(yearly)} years, {yearly.shape[1]} metrics, {len(gap_columns)} gap columns correlated")
+    return yoy_deltas, rolling_means, trends, gap_correlations
+
+def load_analytics_tables(yoy_deltas, rolling_means, trends, gap_correlations, db_path = None):
+
+    if db_path is None:
+        db_path = os.path.join(parent_directory, 'data', output_database_name)
+
+    # all analytics tables are replaced in one transaction
+    conn = sqlite3.connect(db_path)
+    try:
+        replace_tables(conn, dict(zip(analytics_tables.values(), [yoy_deltas, rolling_means, trends, gap_correlations])))
+    finally:
+        conn.close()
+    print(f"Analytics tables written: {', '.join(analytics_tables.values())}")
+
+def write_to_sinks_with_analytics(df, yoy_deltas, rolling_means, trends, gap_correlations, sink_names = ["sqlite"], sink_options = None):
+    # swap loads publish the analytics as part of the same version as the output table, so a rollback restores both
+    sink_options = dict(sink_options or {})
+    sink_options["sqlite"] = dict(sink_options.get("sqlite", {}), extra_tables=dict(zip(analytics_tables, [yoy_deltas, rolling_means, trends, gap_correlations])))
+    write_to_sinks(df, sink_names, sink_options)
+
+# -----------------ANALYTICS-----------------#
+
+# -----------------STREAMING MODE-----------------#
+# Out-of-core path: sources are read chunk by chunk, row-local steps run per chunk and every
+# transformed chunk is appended to SQLite staging tables. The join, ordering and final table are done by SQLite.
+
+def iter_selected_chunks(chunk_source, select_columns, warn_missing_columns = False):
+
+    # selected columns of every chunk, a row already seen in an earlier chunk is dropped like drop_duplicates
+    # does on the whole frame. Only a 64 bit hash per distinct row is kept
+    seen_rows = set()
+    for chunk in chunk_source():
+        chunk = select_columns(chunk, warn_missing_columns=warn_missing_columns)
+        warn_missing_columns = False
+        hashes = pd.Series(row_hashes(chunk))
+        new_rows = ~(hashes.duplicated().to_numpy() | hashes.isin(seen_rows).to_numpy())
+        seen_rows.update(hashes[new_rows].tolist())
+        yield chunk if new_rows.all() else chunk[new_rows]
+
+def accumulate_column_means(chunk_source, select_columns, exclude_columns):
+
+    # first pass: running sums and counts, so the mean imputation matches a full in-memory pass
+    sums = None
+    counts = None
+    for chunk in iter_selected_chunks(chunk_source, select_columns):
+        fill_columns = [col for col in chunk.columns if col not in exclude_columns and pd.api.types.is_numeric_dtype(chunk[col])]
+        values = chunk[fill_columns].to_numpy(dtype="float64")
+        chunk_sums = pd.Series(np.nansum(values, axis=0), index=fill_columns)
+        chunk_counts = pd.Series((~np.isnan(values)).sum(axis=0), index=fill_columns)
+        sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+
+    if sums is None:
+        return {}
+    return (sums / counts.where(counts > 0)).dropna().to_dict()
+
+def iter_transformed_chunks(chunk_source, select_columns, exclude_columns, metric_spec):
+
+    fill_values = accumulate_column_means(chunk_source, select_columns, exclude_columns)
+
+    # second pass: select, rename, filter, fill and compute the metrics per chunk
+    for chunk in iter_selected_chunks(chunk_source, select_columns, warn_missing_columns=True):
+        if chunk.empty:
+            continue
+        chunk = chunk.fillna(fill_values)
+        yield apply_metric_spec(chunk, metric_spec)
+
+def append_chunks_to_staging(conn, chunks, staging_table_name, chunk_size = 10000):
+    columns = None
+    rows = 0
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(staging_table_name)}")
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.dtypes
+            conn.execute(build_table_ddl(chunk, staging_table_name))
+        insert_rows_chunked(conn, chunk, staging_table_name, chunk_size)
+        rows += len(chunk)
+    return columns, rows
+
+def run_streaming_pipeline(wages_zip_path, employment_zip_path, db_path = None, chunksize = 100000, table_name = output_table_name):
+
+    if db_path is None:
+        db_path = os.path.join(parent_directory, 'data', output_database_name)
+
+    data_sources = {
+        "wages": lambda: iter_csv_chunks_from_zip(wages_zip_path, chunksize=chunksize, **wages_ingestion_schema),
+        "employment": lambda: iter_csv_chunks_from_zip(employment_zip_path, chunksize=chunksize, **employment_ingestion_schema),
+    }
+    wages_chunks = iter_transformed_chunks(data_sources["wages"], select_wages_columns, ["year"] + dimension_columns, wages_metric_spec)
+    employment_chunks = iter_transformed_chunks(data_sources["employment"], select_employment_columns, ["year", "total_population"] + dimension_columns, employment_metric_spec)
+
+    wages_staging_name = f"{table_name}_staging_wages"
+    employment_staging_name = f"{table_name}_staging_employment"
+
+    conn = sqlite3.connect(db_path)
+    if table_exists(conn, versions_table_name(table_name)):
+        conn.close()
+        sys.exit(f"{table_name} is published with swap loads, a streaming replace would bypass its versions. "
+                 f"Run without --chunksize and with --load-mode swap...")
+    previous_pragmas = apply_bulk_load_pragmas(conn)
+    try:
+        #1. Append every transformed chunk to a staging table
+        conn.execute("BEGIN")
+        wages_dtypes, wages_rows = append_chunks_to_staging(conn, wages_chunks, wages_staging_name, chunksize)
+        employment_dtypes, employment_rows = append_chunks_to_staging(conn, employment_chunks, employment_staging_name, chunksize)
+        conn.commit()
+        if wages_dtypes is None or employment_dtypes is None:
+            sys.exit("One or both datasets are empty after the streaming transform. Exiting pipeline...")
+        print(f"Streaming transform: {wages_rows} wages rows and {employment_rows} employment rows staged")
+
+        #2. Join the staged datasets on their shared key columns, same column order as the in-memory merge
+        join_keys = [col for col in wages_dtypes.index if col in employment_dtypes.index]
+        merged_dtypes = pd.concat([wages_dtypes, employment_dtypes.drop(join_keys)])
+        final_columns = list(merged_dtypes.index)
+        if "total_population" in final_columns:
+            final_columns.remove("total_population")
+            final_columns.insert(1, "total_population")
+        final_frame_schema = pd.DataFrame({col: pd.Series(dtype=merged_dtypes[col]) for col in final_columns})
+
+        keys_sql = ", ".join(quote_identifier(col) for col in join_keys)
+        for staging_name in [wages_staging_name, employment_staging_name]:
+            conn.execute(f"CREATE INDEX {quote_identifier(staging_name + '_keys')} ON {quote_identifier(staging_name)} ({keys_sql})")
+        wages_staging = quote_identifier(wages_staging_name)
+        employment_staging = quote_identifier(employment_staging_name)
+
+        select_sql = ", ".join(
+            f"w.{quote_identifier(col)}" if col in wages_dtypes.index else f"e.{quote_identifier(col)}" for col in final_columns)
+        join_sql = " AND ".join(f"w.{quote_identifier(col)} = e.{quote_identifier(col)}" for col in join_keys)
+        order_sql = ", ".join(["w.year DESC"] + [f"w.{quote_identifier(col)}" for col in dimension_columns if col in join_keys])
+
+        #3. Swap in the final table in one transaction, sorted like merged_data_set_transformation
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(row_hash_table_name(table_name))}")
+        conn.execute(build_table_ddl(final_frame_schema, table_name))
+        conn.execute(f"INSERT INTO {quote_identifier(table_name)} ({', '.join(quote_identifier(col) for col in final_columns)}) "
+                     f"SELECT {select_sql} FROM {wages_staging} AS w JOIN {employment_staging} AS e ON {join_sql} ORDER BY {order_sql}")
+        create_indexes(conn, table_name, ["year"])
+        conn.execute(f"DROP TABLE {wages_staging}")
+        conn.execute(f"DROP TABLE {employment_staging}")
+        conn.commit()
+        conn.execute(f"ANALYZE {quote_identifier(table_name)}")
+        build_summary_tables(conn, table_name)
+
+        loaded_rows = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+        print(f"Streaming load: {loaded_rows} rows written to {table_name}")
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        restore_pragmas(conn, previous_pragmas)
+        conn.close()
+
+    return loaded_rows
+
+# -----------------STREAMING MODE-----------------#
+
+# -----------------INSTRUMENTATION-----------------#
+run_report_name = 'run_report.json'
+
+def stage_frames(value):
+    if isinstance(value, pd.DataFrame):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [item for item in value if isinstance(item, pd.DataFrame)]
+    return []
+
+def frame_stats(value):
+    # rows, columns and memory of a frame, or summed over a list/tuple of frames
+    frames = stage_frames(value)
+    return (sum(len(frame) for frame in frames),
+            sum(frame.shape[1] for frame in frames),
+            int(sum(frame.memory_usage(deep=True).sum() for frame in frames)))
+
+def column_memory_saved_bytes(column):
+
+    # Bytes saved against pandas' default representation: 8 byte numbers and one python object per string
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        category_bytes = np.array([sys.getsizeof(value) for value in column.cat.categories], dtype="int64")
+        default_bytes = 8 * len(column) + int((np.bincount(codes[codes >= 0], minlength=len(category_bytes)) * category_bytes).sum())
+    elif pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+        default_bytes = 8 * len(column)
+    else:
+        return 0
+    return int(default_bytes - column.memory_usage(index=False, deep=True))
+
+def memory_saved_bytes(value):
+    return sum(column_memory_saved_bytes(frame.iloc[:, position]) for frame in stage_frames(value) for position in range(frame.shape[1]))
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+# tracemalloc slows pandas-heavy stages down considerably, so peak tracing is opt-in. Its peak is process wide,
+# a run that traces executes its DAG nodes one at a time so every peak belongs to a single stage
+def new_run_report(trace_memory = False):
+    return {"started_at": datetime.now(timezone.utc).isoformat(), "trace_memory": trace_memory, "stages": []}
+
+def run_stage(run_report, stage_name, func, *args, **kwargs):
+
+    rows_in, columns_in, memory_in = frame_stats(list(args) + list(kwargs.values()))
+
+    if run_report["trace_memory"]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = func(*args, **kwargs)
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+
+    rows_out, columns_out, memory_out = frame_stats(result)
+    run_report["stages"].append({
+        "stage": stage_name,
+        "wall_seconds": round(wall_seconds, 4),
+        "cpu_seconds": round(cpu_seconds, 4),
+        "peak_traced_bytes": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "rows_in": rows_in,
+        "columns_in": columns_in,
+        "memory_in_bytes": memory_in,
+        "rows_out": rows_out,
+        "columns_out": columns_out,
+        "memory_out_bytes": memory_out,
+        "memory_saved_bytes": memory_saved_bytes(result),
+    })
+    return result
+
+def finish_run_report(run_report, report_path = None):
+    if run_report["trace_memory"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    run_report["finished_at"] = datetime.now(timezone.utc).isoformat()
+    run_report["total_wall_seconds"] = round(sum(stage["wall_seconds"] for stage in run_report["stages"]), 4)
+
+    if report_path is None:
+        report_path = os.path.join(parent_directory, 'data', run_report_name)
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(run_report, f, indent=2)
+    return report_path
+
+def format_run_summary(run_report):
+    mb = 1024 * 1024
+    lines = [f"{'stage':<40} {'wall s':>8} {'cpu s':>8} {'peak MB':>9} {'rows in->out':>17} {'cols':>9} {'mem MB':>8} {'saved MB':>9}"]
+    for stage in run_report["stages"]:
+        peak = stage["peak_traced_bytes"]
+        lines.append(
+            f"{stage['stage'] + (' (cached)' if stage.get('cache_hit') else ''):<40} {stage['wall_seconds']:>8.3f} {stage['cpu_seconds']:>8.3f} "
+            f"{(peak / mb if peak is not None else float('nan')):>9.2f} "
+            f"{str(stage['rows_in']) + '->' + str(stage['rows_out']):>17} "
+            f"{str(stage['columns_in']) + '->' + str(stage['columns_out']):>9} {stage['memory_out_bytes'] / mb:>8.2f} "
+            f"{stage.get('memory_saved_bytes', 0) / mb:>9.2f}")
+    return "\n".join(lines)
+
+# -----------------INSTRUMENTATION-----------------#
+
+# -----------------STAGE CACHE-----------------#
+
+stage_cache_directory_name = "stage_cache"
+
+def pipeline_code_version():
+    # any edit to this module invalidates every cached stage output
+    global _pipeline_code_version
+    if "_pipeline_code_version" not in globals():
+        _pipeline_code_version = file_content_hash(os.path.abspath(__file__))[:16]
+    return _pipeline_code_version
+
+def transform_parameters():
+    return {
+        "imputation_strategy": imputation_strategy,
+        "wages_years_to_remove": wages_years_to_remove,
+        "dimension_columns": dimension_columns,
+        "wages_data_mapper": wages_data_mapper,
+        "employment_data_mapper": employment_data_mapper,
+    }
+
+def update_fingerprint(sha256, value):
+    if isinstance(value, pd.DataFrame):
+        sha256.update(json.dumps([list(map(str, value.columns)), list(map(str, value.dtypes))]).encode("utf-8"))
+        sha256.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            sha256.update(str(key).encode("utf-8"))
+            update_fingerprint(sha256, value[key])
+    elif isinstance(value, (list, tuple)):
+        sha256.update(f"[{len(value)}".encode("utf-8"))
+        for item in value:
+            update_fingerprint(sha256, item)
+    elif isinstance(getattr(value, "__self__", None), (set, frozenset)):
+        # usecols callables built by build_ingestion_schema
+        update_fingerprint(sha256, sorted(value.__self__))
+    else:
+        sha256.update(repr(value).encode("utf-8"))
+
+def stage_cache_key(stage_name, inputs, parameters = None):
+    sha256 = hashlib.sha256()
+    update_fingerprint(sha256, [stage_name, pipeline_code_version(), parameters or {}, inputs])
+    return sha256.hexdigest()
+
+def is_stage_cache_entry_valid(cache_directory_path, entry):
+    return all(os.path.exists(os.path.join(cache_directory_path, file_name)) for file_name in entry["files"])
+
+def read_stage_output(cache_directory_path, entry):
+    frames = [pd.read_parquet(os.path.join(cache_directory_path, file_name)) for file_name in entry["files"]]
+    if entry["kind"] == "frame":
+        return frames[0]
+    return tuple(frames) if entry["kind"] == "tuple" else frames
+
+def write_stage_output(cache_directory_path, key, stage_name, result):
+    frames = [result] if isinstance(result, pd.DataFrame) else list(result)
+    entry_directory_path = os.path.join(cache_directory_path, key)
+    os.makedirs(entry_directory_path, exist_ok=True)
+
+    files = []
+    for position, frame in enumerate(frames):
+        file_name = os.path.join(key, f"{position}.parquet")
+        frame.to_parquet(os.path.join(cache_directory_path, file_name), compression="zstd")
+        files.append(file_name)
+
+    return {
+        "stage": stage_name,
+        "kind": "frame" if isinstance(result, pd.DataFrame) else type(result).__name__,
+        "files": files,
+        "size": sum(os.path.getsize(os.path.join(cache_directory_path, file_name)) for file_name in files),
+        "created_at": time.time(),
+        "last_used": time.time(),
+    }
+
+def evict_stage_cache_entries(cache_directory_path, manifest, maximum_size_bytes, maximum_age_seconds, keep_key = None):
+    now = time.time()
+
+    # Expired entries go first, then least recently used ones until the cache fits
+    expired = [key for key, entry in manifest.items() if key != keep_key and now - entry["created_at"] > maximum_age_seconds]
+    total_size = sum(entry["size"] for entry in manifest.values())
+    for key, entry in sorted(manifest.items(), key=lambda item: item[1]["last_used"]):
+        if total_size <= maximum_size_bytes:
+            break
+        if key != keep_key and key not in expired:
+            expired.append(key)
+            total_size -= entry["size"]
 
-    print("Loading Transformed Datasets into SQLite db sink....")
-    load_datasets(final_transformed_data_set)
-    print("Datasets Loaded into sink successfully\n")
+    for key in expired:
+        del manifest[key]
+        shutil.rmtree(os.path.join(cache_directory_path, key), ignore_errors=True)
+        print(f"Stage cache evicted: {key}")
+
+def memoized_stage(run_report, stage_name, func, *args, stage_cache_directory_path = None, stage_parameters = None, **kwargs):
+
+    # Without a cache directory (or without pyarrow for the parquet files) the stage simply runs
+    if stage_cache_directory_path is None or importlib.util.find_spec("pyarrow") is None:
+        return run_stage(run_report, stage_name, func, *args, **kwargs)
+
+    os.makedirs(stage_cache_directory_path, exist_ok=True)
+    key = stage_cache_key(stage_name, [list(args), kwargs], stage_parameters)
+
+    with cache_manifest_lock:
+        entry = read_cache_manifest(stage_cache_directory_path).get(key)
+
+    if entry is not None and is_stage_cache_entry_valid(stage_cache_directory_path, entry):
+        print(f"Stage cache hit: {stage_name}, loading the stored output")
+        result = run_stage(run_report, stage_name, read_stage_output, stage_cache_directory_path, entry)
+        cache_hit = True
+    else:
+        result = run_stage(run_report, stage_name, func, *args, **kwargs)
+        entry = write_stage_output(stage_cache_directory_path, key, stage_name, result)
+        cache_hit = False
+    run_report["stages"][-1]["cache_hit"] = cache_hit
+
+    with cache_manifest_lock:
+        manifest = read_cache_manifest(stage_cache_directory_path)
+        entry["last_used"] = time.time()
+        manifest[key] = entry
+        evict_stage_cache_entries(stage_cache_directory_path, manifest, maximum_stage_cache_size_bytes, maximum_stage_cache_age_seconds, keep_key=key)
+        write_cache_manifest(stage_cache_directory_path, manifest)
+
+    return result
+
+# -----------------STAGE CACHE-----------------#
+
+# -----------------DAG RUNNER-----------------#
+
+dag_artifacts_directory_name = "dag_artifacts"
+
+# Transform kinds a configured dataset can use: transform function and ingestion schema
+dataset_transforms = {
+    "wages": (transform_wages_data_set, wages_ingestion_schema),
+    "employment": (transform_employment_data_set, employment_ingestion_schema),
+}
+
+# column selection of every transform kind, the source rules are checked on the selected columns
+dataset_column_selections = {"wages": select_wages_columns, "employment": select_employment_columns}
+
+def load_pipeline_config(config_path = None):
+
+    # Without a config file the pipeline runs the two Kaggle datasets it was built for
+    if config_path is None:
+        return {"datasets": [
+            {"name": "wages", "source": dataset_names[0], "transform": "wages"},
+            {"name": "employment", "source": dataset_names[1], "transform": "employment"},
+        ]}
+
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Could not read the pipeline config {config_path}: {e}")
+
+    datasets = config.get("datasets", [])
+    for dataset in datasets:
+        # kaggle_dataset is the older spelling of a Kaggle source
+        if "source" not in dataset and "kaggle_dataset" in dataset:
+            dataset["source"] = dataset["kaggle_dataset"]
+        missing_keys = [key for key in ["name", "source", "transform"] if key not in dataset]
+        if missing_keys:
+            sys.exit(f"Dataset entry {dataset} in {config_path} is missing: {', '.join(missing_keys)}")
+        if dataset["transform"] not in dataset_transforms:
+            sys.exit(f"Unknown transform '{dataset['transform']}' for dataset {dataset['name']}. Use one of: {', '.join(dataset_transforms)}")
+    if len(datasets) < 2:
+        sys.exit(f"The pipeline config {config_path} needs at least two datasets to merge")
+    return config
+
+def pipeline_node(name, func, inputs = [], outputs = [], after = [], kwargs = None, cache_parameters = None):
+    # inputs/outputs are named values passed between nodes, after lists nodes that only have to finish first.
+    # cache_parameters returns the stage cache parameters (None skips the cache), leave it unset for uncached nodes
+    return {"name": name, "func": func, "inputs": list(inputs), "outputs": list(outputs), "after": list(after),
+            "kwargs": kwargs or {}, "cache_parameters": cache_parameters}
+
+def extraction_cache_parameters(source):
+    version = source_version(source)
+    return None if version is None else {"version": version}
+
+def merge_all_data_sets(*transformed_data_sets):
+    merged_data_set = transformed_data_sets[0]
+    for data_set in transformed_data_sets[1:]:
+        merged_data_set = merge_data_sets(merged_data_set, data_set)
+    return merged_data_set
+
+def build_pipeline_dag(config, load_mode = "replace", sink_names = ["sqlite"]):
+
+    # setup starts prefetching every source, the extract nodes pick up the downloads when they are ready
+    cache_directory_path = os.path.join(parent_directory, 'data', 'cache')
+    nodes = [pipeline_node("setup_sources", setup_sources,
+                           kwargs={"sources": [dataset["source"] for dataset in config["datasets"]], "cache_directory_path": cache_directory_path})]
+
+    # failing rows go to the quarantine table next to the output table instead of stopping the run
+    quarantine_db_path = os.path.join(parent_directory, 'data', output_database_name) if "sqlite" in sink_names else None
+
+    transformed_outputs = []
+    for dataset in config["datasets"]:
+        name = dataset["name"]
+        transform_function, ingestion_schema = dataset_transforms[dataset["transform"]]
+        read_options = dict(ingestion_schema, member=dataset.get("member"))
+
+        nodes.append(pipeline_node(f"extract_{name}", extract_source_data_set, outputs=[f"{name}_raw"], after=["setup_sources"],
+                                   kwargs=dict(read_options, source=dataset["source"], cache_directory_path=cache_directory_path),
+                                   cache_parameters=lambda source=dataset["source"]: extraction_cache_parameters(source)))
+        # null fractions are checked before the transform imputes the missing values
+        nodes.append(pipeline_node(f"validate_{name}", validate_source_data_set, inputs=[f"{name}_raw"], outputs=[f"{name}_validated"],
+                                   kwargs={"select_columns": dataset_column_selections[dataset["transform"]], "quarantine_db_path": quarantine_db_path}))
+        nodes.append(pipeline_node(f"transform_{name}", transform_function, inputs=[f"{name}_validated"], outputs=[f"{name}_transformed"],
+                                   cache_parameters=transform_parameters))
+        transformed_outputs.append(f"{name}_transformed")
+
+    nodes.append(pipeline_node("merge_data_sets", merge_all_data_sets, inputs=transformed_outputs, outputs=["merged_data_set"], cache_parameters=dict))
+    nodes.append(pipeline_node("merged_data_set_transformation", merged_data_set_transformation, inputs=["merged_data_set"],
+                               outputs=["final_data_set"], cache_parameters=dict))
+    nodes.append(pipeline_node("validate_data_set", validate_data_set, inputs=["final_data_set"], outputs=["validated_data_set"],
+                               kwargs={"quarantine_db_path": quarantine_db_path}))
+    # analytics are computed next to the load and written to the output DB once the main table is in place,
+    # swap loads take them along into the version they publish
+    nodes.append(pipeline_node("compute_analytics", compute_analytics, inputs=["validated_data_set"], outputs=list(analytics_tables),
+                               cache_parameters=lambda: {"analytics_rolling_window": analytics_rolling_window}))
+    load_kwargs = {"sink_names": sink_names, "sink_options": {"sqlite": {"mode": load_mode}}}
+    if load_mode == "swap" and "sqlite" in sink_names:
+        nodes.append(pipeline_node("load_datasets", write_to_sinks_with_analytics, inputs=["validated_data_set"] + list(analytics_tables), kwargs=load_kwargs))
+    else:
+        nodes.append(pipeline_node("load_datasets", write_to_sinks, inputs=["validated_data_set"], kwargs=load_kwargs))
+        if "sqlite" in sink_names:
+            nodes.append(pipeline_node("load_analytics", load_analytics_tables, inputs=list(analytics_tables), after=["load_datasets"]))
+    return nodes
+
+def node_dependencies(nodes):
+
+    names = [node["name"] for node in nodes]
+    if len(set(names)) != len(names):
+        sys.exit("Pipeline DAG has duplicate node names")
+
+    producers = {}
+    for node in nodes:
+        for output in node["outputs"]:
+            if output in producers:
+                sys.exit(f"Output '{output}' is produced by both {producers[output]} and {node['name']}")
+            producers[output] = node["name"]
+
+    dependencies = {}
+    for node in nodes:
+        missing = [value for value in node["inputs"] if value not in producers] + [name for name in node["after"] if name not in names]
+        if missing:
+            sys.exit(f"Node {node['name']} depends on unknown input(s)/node(s): {', '.join(missing)}")
+        dependencies[node["name"]] = {producers[value] for value in node["inputs"]} | set(node["after"])
+    return dependencies, producers
+
+def execution_waves(dependencies):
+
+    # Kahn's algorithm by levels: every node in a wave only depends on earlier waves
+    remaining = {name: set(depends_on) for name, depends_on in dependencies.items()}
+    waves = []
+    while remaining:
+        wave = sorted(name for name, depends_on in remaining.items() if not depends_on)
+        if not wave:
+            sys.exit(f"Pipeline DAG has a cycle between: {', '.join(sorted(remaining))}")
+        waves.append(wave)
+        for name in wave:
+            del remaining[name]
+        for depends_on in remaining.values():
+            depends_on.difference_update(wave)
+    return waves
+
+def related_nodes(dependencies, start, upstream = True):
+    # all ancestors (upstream) or descendants of start, start included
+    edges = dependencies if upstream else {name: {other for other, depends_on in dependencies.items() if name in depends_on} for name in dependencies}
+    found, stack = {start}, [start]
+    while stack:
+        for name in edges[stack.pop()]:
+            if name not in found:
+                found.add(name)
+                stack.append(name)
+    return found
+
+def select_nodes(dependencies, from_node = None, until_node = None):
+    selected = set(dependencies)
+    for name in [from_node, until_node]:
+        if name is not None and name not in dependencies:
+            sys.exit(f"Unknown pipeline node '{name}'. Nodes: {', '.join(dependencies)}")
+    if until_node is not None:
+        selected &= related_nodes(dependencies, until_node, upstream=True)
+    if from_node is not None:
+        selected &= related_nodes(dependencies, from_node, upstream=False)
+    return {name: dependencies[name] & selected for name in dependencies if name in selected}
+
+def format_execution_plan(waves):
+    return "\n".join(f"  {position}. {', '.join(wave)}" for position, wave in enumerate(waves, start=1))
+
+def run_dag_node(node, values, run_report, stage_cache_directory_path = None):
+    args = [values[value] for value in node["inputs"]]
+    parameters = node["cache_parameters"]() if node["cache_parameters"] is not None and stage_cache_directory_path is not None else None
+    return memoized_stage(run_report, node["name"], node["func"], *args,
+                          stage_cache_directory_path=stage_cache_directory_path if parameters is not None else None,
+                          stage_parameters=parameters, **node["kwargs"])
+
+def run_dag(nodes, run_report = None, from_node = None, until_node = None, dry_run = False, max_workers = 4,
+            stage_cache_directory_path = None, artifacts_directory_path = None, only_nodes = None, initial_values = None):
+
+    dependencies, producers = node_dependencies(nodes)
+    selected = select_nodes(dependencies, from_node, until_node)
+    if only_nodes is not None:
+        selected = {name: depends_on & set(only_nodes) for name, depends_on in selected.items() if name in only_nodes}
+    waves = execution_waves(selected)
+
+    print("Execution plan:")
+    print(format_execution_plan(waves))
+    if dry_run:
+        return waves
+
+    if run_report is None:
+        run_report = new_run_report(trace_memory=False)
+    if run_report["trace_memory"]:
+        max_workers = 1
+    nodes_by_name = {node["name"]: node for node in nodes}
+    can_persist = artifacts_directory_path is not None and importlib.util.find_spec("pyarrow") is not None
+
+    # Inputs produced by nodes outside a partial run are taken from initial_values (outputs a long-running process
+    # kept in memory) or come from the artifacts of an earlier run
+    values = dict(initial_values) if initial_values else {}
+    for name in selected:
+        for value in nodes_by_name[name]["inputs"]:
+            if producers[value] in selected or value in values:
+                continue
+            artifact_path = os.path.join(artifacts_directory_path, f"{value}.parquet") if can_persist else None
+            if artifact_path is None or not os.path.exists(artifact_path):
+                sys.exit(f"No stored output '{value}' for node {name}. Run the pipeline with --until {producers[value]} first.")
+            values[value] = pd.read_parquet(artifact_path)
+
+    if can_persist:
+        os.makedirs(artifacts_directory_path, exist_ok=True)
+
+    # Independent nodes run side by side, a node starts as soon as everything it depends on is done
+    pending = {name: set(depends_on) for name, depends_on in selected.items()}
+    running = {}
+    load_lazy_modules()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name in sorted(name for name, depends_on in pending.items() if not depends_on):
+                del pending[name]
+                running[executor.submit(run_dag_node, nodes_by_name[name], values, run_report, stage_cache_directory_path)] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result = future.result()
+
+                outputs = nodes_by_name[name]["outputs"]
+                results = [result] if len(outputs) == 1 else list(result) if outputs else []
+                for output, value in zip(outputs, results):
+                    values[output] = value
+                    if can_persist and isinstance(value, pd.DataFrame):
+                        value.to_parquet(os.path.join(artifacts_directory_path, f"{output}.parquet"), compression="zstd")
+
+                for depends_on in pending.values():
+                    depends_on.discard(name)
+    return values
+
+def stage_nodes(nodes, stage):
+    # the nodes of one CLI stage (extract, transform or load), everything upstream is read from the stored artifacts
+    names = [node["name"] for node in nodes]
+    extract = {name for name in names if name == "setup_sources" or name.startswith("extract_")}
+    load = {name for name in names if name.startswith("load_")}
+    return {"extract": extract, "load": load, "transform": set(names) - extract - load}[stage]
+
+# -----------------DAG RUNNER-----------------#
+
+# -----------------RUN STATE-----------------#
+
+last_run_name = 'last_run.json'
+
+def output_state(sink_names):
+    # modification time of every sink output, a missing output forces a run.
+    # While a reader keeps the database open, writes stay in the -wal file until a checkpoint
+    paths = {"sqlite": os.path.join(parent_directory, 'data', output_database_name),
+             "parquet": os.path.join(parent_directory, 'data', output_parquet_directory_name)}
+    state = {}
+    for name in sorted(sink_names):
+        if not os.path.exists(paths[name]):
+            return None
+        state[name] = [os.stat(path).st_mtime_ns for path in [paths[name], paths[name] + "-wal"] if os.path.exists(path)]
+    return state
+
+def run_fingerprint(config, load_mode, sink_names, versions = None):
+    # everything the output of a full run depends on, None when a source has no cheap version
+    if versions is None:
+        versions = [source_version(dataset["source"]) for dataset in config["datasets"]]
+    if any(version is None for version in versions):
+        return None
+    payload = {"code": pipeline_code_version(), "config": config, "versions": versions, "load_mode": load_mode, "sink_names": sorted(sink_names)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def read_last_run():
+    try:
+        with open(os.path.join(parent_directory, 'data', last_run_name), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_last_run(fingerprint, sink_names):
+    with open(os.path.join(parent_directory, 'data', last_run_name), "w") as f:
+        json.dump({"fingerprint": fingerprint, "finished_at": datetime.now(timezone.utc).isoformat(), "outputs": output_state(sink_names)}, f, indent=2)
+
+def is_unchanged_since_last_run(fingerprint, sink_names):
+    last_run = read_last_run()
+    return fingerprint is not None and last_run.get("fingerprint") == fingerprint and last_run.get("outputs") == output_state(sink_names)
+
+def pipeline_status():
+
+    # Plain file and sqlite reads only, pandas is never imported
+    data_directory_path = os.path.join(parent_directory, 'data')
+    lines = []
+
+    #1. Last run
+    run_report_path = os.path.join(data_directory_path, run_report_name)
+    try:
+        with open(run_report_path, "r") as f:
+            run_report = json.load(f)
+        cache_hits = sum(1 for stage in run_report["stages"] if stage.get("cache_hit"))
+        lines.append(f"Last run:       finished {run_report.get('finished_at')}, {len(run_report['stages'])} stages "
+                     f"({cache_hits} cached), {run_report.get('total_wall_seconds')} s")
+    except (OSError, ValueError, KeyError):
+        lines.append("Last run:       no run report yet")
+    last_run = read_last_run()
+    if last_run:
+        lines.append(f"Last full run:  {last_run.get('finished_at')} (fingerprint {last_run.get('fingerprint')})")
+
+    #2. Output database tables and row counts
+    db_path = os.path.join(data_directory_path, output_database_name)
+    if os.path.exists(db_path):
+        lines.append(f"Database:       {db_path} ({os.path.getsize(db_path) / (1024 * 1024):.2f} MB)")
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        try:
+            for (table_name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"):
+                row_count = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+                lines.append(f"  {table_name:<60} {row_count:>10} rows")
+            if table_exists(conn, versions_table_name(output_table_name)):
+                lines.append(f"Published:      version {live_version(conn, output_table_name)} live, "
+                             f"kept for rollback: {', '.join(map(str, kept_versions(conn, output_table_name))) or 'none'} "
+                             f"(summaries and analytics roll back with it, the quarantine log does not)")
+        finally:
+            conn.close()
+    else:
+        lines.append(f"Database:       {db_path} does not exist yet")
+
+    #3. Caches and stored DAG outputs
+    for label, directory_name in [("Download cache", "cache"), ("Stage cache", stage_cache_directory_name)]:
+        manifest = read_cache_manifest(os.path.join(data_directory_path, directory_name))
+        total_size = sum(entry.get("size", 0) for entry in manifest.values())
+        lines.append(f"{label + ':':<16}{len(manifest)} entries, {total_size / (1024 * 1024):.2f} MB")
+    artifacts_directory_path = os.path.join(data_directory_path, dag_artifacts_directory_name)
+    artifacts = sorted(name for name in os.listdir(artifacts_directory_path)) if os.path.isdir(artifacts_directory_path) else []
+    lines.append(f"Artifacts:      {', '.join(os.path.splitext(name)[0] for name in artifacts) or 'none'}")
+
+    #4. Watch daemon health
+    health = read_health(os.path.join(data_directory_path, health_file_name))
+    if health:
+        last_run = health.get("last_run") or {}
+        lines.append(f"Watch daemon:   pid {health.get('pid')} {health.get('status')}, {health.get('polls')} polls, {health.get('runs')} runs "
+                     f"({health.get('failures')} failed), last poll {health.get('last_poll_at')}, last run {last_run.get('status', 'none')}"
+                     f"{' in ' + str(last_run.get('wall_seconds')) + ' s' if last_run else ''}")
+    return "\n".join(lines)
+
+# -----------------RUN STATE-----------------#
+
+dataset_names = [
+    "asaniczka/wages-by-education-in-the-usa-1973-2022",
+    "asaniczka/employment-to-population-ratio-for-usa-1979-2023",
+]
+
+# Streaming mode reads the two Kaggle datasets and replaces the sqlite table, without the DAG's config, stage cache,
+# validation or versions. Options it cannot honour are rejected instead of ignored
+def streaming_option_conflicts(load_mode = "replace", sink_names = ["sqlite"], config_path = None, from_node = None, until_node = None, dry_run = False):
+    options = {
+        "--config": config_path is not None,
+        f"--load-mode {load_mode}": load_mode != "replace",
+        f"--sink {' '.join(sink_names)}": sink_names != ["sqlite"],
+        "--from": from_node is not None,
+        "--until": until_node is not None,
+        "--dry-run": dry_run,
+    }
+    return [option for option, used in options.items() if used]
+
+def main(load_mode = "replace", sink_names = ["sqlite"], report_path = None, trace_memory = False, chunksize = None, stage_cache = True,
+         config_path = None, from_node = None, until_node = None, dry_run = False, stage = None, skip_unchanged = False):
+    print("\nETL Pipeline started...")
+    # Please sign into Kaggle -> Go to Settings
+    # Create API token -> place kaggle.json file into project directory
+    # Run the script
+
+    run_report = new_run_report(trace_memory)
+
+    if chunksize:
+        conflicts = streaming_option_conflicts(load_mode, sink_names, config_path, from_node, until_node, dry_run)
+        if conflicts:
+            sys.exit(f"--chunksize can't be combined with {', '.join(conflicts)}. Exiting pipeline...")
+        print(f"Setting Up Kaggle API...")
+        setKaggleAPI()
+        print(f"Kaggle API Setup Done...\n")
+
+        # Out-of-core mode: memory stays bounded by the chunk size instead of the dataset size
+        enable_copy_on_write()
+        print(f"Fetching Datasets for streaming mode (chunks of {chunksize} rows)...")
+        zip_file_paths = run_stage(run_report, "data_sets_extraction", fetch_data_set_archives, dataset_names)
+        run_stage(run_report, "streaming_transform_and_load", run_streaming_pipeline, *zip_file_paths, chunksize=chunksize)
+
+        report_path = finish_run_report(run_report, report_path)
+        print(format_run_summary(run_report))
+        print("ETL Pipeline completed successfully....")
+        print("\n")
+        return
+
+    # Setup, extract, transform, merge, post-process and load run as a DAG, independent nodes side by side.
+    # Stages whose inputs, parameters and code are unchanged since a previous run are loaded from data/stage_cache
+    config = load_pipeline_config(config_path)
+
+    # A full run with the same sources, code and settings as the last one, whose outputs are untouched, has nothing to do
+    full_run = stage is None and from_node is None and until_node is None and not dry_run
+    fingerprint = run_fingerprint(config, load_mode, sink_names) if skip_unchanged and full_run else None
+    if fingerprint is not None and is_unchanged_since_last_run(fingerprint, sink_names):
+        print("Sources, code and outputs are unchanged since the last run. Nothing to do (use --force to run anyway).\n")
+        return
+
+    enable_copy_on_write()
+    nodes = build_pipeline_dag(config, load_mode, sink_names)
+    print(f"Running the pipeline for datasets: {', '.join(dataset['name'] for dataset in config['datasets'])}")
+
+    try:
+        run_dag(nodes, run_report, from_node=from_node, until_node=until_node, dry_run=dry_run,
+                stage_cache_directory_path=os.path.join(parent_directory, 'data', stage_cache_directory_name) if stage_cache else None,
+                artifacts_directory_path=os.path.join(parent_directory, 'data', dag_artifacts_directory_name),
+                only_nodes=stage_nodes(nodes, stage) if stage is not None else None)
+    finally:
+        stop_prefetch()
+    if dry_run:
+        print("Dry run, nothing was executed.\n")
+        return
+    if fingerprint is not None:
+        record_last_run(fingerprint, sink_names)
+
+    report_path = finish_run_report(run_report, report_path)
+    print(format_run_summary(run_report))
+    print(f"Run report written to {report_path}\n")
 
     print("ETL Pipeline completed successfully....")
     print("\n")
 
+# -----------------WATCH MODE-----------------#
+
+# One long-running process polls the source versions (metadata only) and re-runs just the nodes downstream of a
+# changed source. Imports, Kaggle credentials and client, and the outputs of the unchanged nodes stay warm between runs.
+watch_poll_seconds = 60
+health_file_name = 'health.json'
+
+def poll_source_versions(config):
+    return {dataset["name"]: source_version(dataset["source"]) for dataset in config["datasets"]}
+
+def changed_data_sets(known_versions, versions):
+    # a source that cannot tell its version (None) never triggers a run
+    return sorted(name for name, version in versions.items() if version is not None and known_versions.get(name) != version)
+
+def affected_nodes(nodes, changed_names):
+    # the extraction of every changed dataset and everything downstream of it
+    dependencies, _ = node_dependencies(nodes)
+    affected = set()
+    for name in changed_names:
+        affected |= related_nodes(dependencies, f"extract_{name}", upstream=False)
+    return affected
+
+def has_upstream_outputs(nodes, selected, values, artifacts_directory_path):
+    # a partial run needs the outputs of the nodes it skips, kept in memory or stored by an earlier run
+    _, producers = node_dependencies(nodes)
+    for node in nodes:
+        if node["name"] not in selected:
+            continue
+        for value in node["inputs"]:
+            if producers[value] not in selected and value not in values and not os.path.exists(os.path.join(artifacts_directory_path, f"{value}.parquet")):
+                return False
+    return True
+
+def write_health(health, health_path):
+    # written next to the target and renamed, a reader never sees half a file
+    temporary_path = health_path + ".tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(health, f, indent=2)
+    os.replace(temporary_path, health_path)
+
+def read_health(health_path = None):
+    if health_path is None:
+        health_path = os.path.join(parent_directory, 'data', health_file_name)
+    try:
+        with open(health_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def refresh_data_sets(nodes, changed_names, values, stage_cache_directory_path = None, artifacts_directory_path = None):
+
+    #1. Only the affected nodes, or every dataset when the outputs of the skipped nodes are not available
+    selected = affected_nodes(nodes, changed_names)
+    if not has_upstream_outputs(nodes, selected, values, artifacts_directory_path):
+        print("Outputs of the unchanged datasets are not available, refreshing every dataset")
+        selected = affected_nodes(nodes, [node["name"][len("extract_"):] for node in nodes if node["name"].startswith("extract_")])
+
+    #2. Setup starts prefetching only the changed sources, the Kaggle credentials were set up once by watch
+    refreshed_sources = [node["kwargs"]["source"] for node in nodes if node["name"].startswith("extract_") and node["name"] in selected]
+    nodes = [dict(node, func=start_prefetch, kwargs=dict(node["kwargs"], sources=refreshed_sources)) if node["name"] == "setup_sources" else node
+             for node in nodes]
+    selected.add("setup_sources")
+
+    #3. Run them, the sinks publish the result in single transactions (sqlite) or by directory swap (parquet)
+    run_report = new_run_report(trace_memory=False)
+    values = run_dag(nodes, run_report, stage_cache_directory_path=stage_cache_directory_path,
+                     artifacts_directory_path=artifacts_directory_path, only_nodes=selected, initial_values=values)
+    finish_run_report(run_report)
+    print(format_run_summary(run_report))
+    return values, sorted(selected)
+
+def watch(config_path = None, interval = None, load_mode = "replace", sink_names = ["sqlite"], stage_cache = True, max_polls = None, health_path = None):
+
+    if interval is None:
+        interval = watch_poll_seconds
+    if health_path is None:
+        health_path = os.path.join(parent_directory, 'data', health_file_name)
+    os.makedirs(os.path.dirname(health_path), exist_ok=True)
+    stage_cache_directory_path = os.path.join(parent_directory, 'data', stage_cache_directory_name) if stage_cache else None
+    artifacts_directory_path = os.path.join(parent_directory, 'data', dag_artifacts_directory_name)
+
+    #1. One-time setup, kept for the lifetime of the process
+    config = load_pipeline_config(config_path)
+    if any(source_adapter_name(dataset["source"]) == "kaggle" for dataset in config["datasets"]):
+        setKaggleAPI()
+    load_lazy_modules()
+    enable_copy_on_write()
+    nodes = build_pipeline_dag(config, load_mode, sink_names)
+    unversioned = [dataset["name"] for dataset in config["datasets"] if source_adapter_name(dataset["source"]) == "http"]
+    if unversioned:
+        print(f"Sources without a version to poll, only loaded on the first run: {', '.join(unversioned)}")
+    print(f"Watching {', '.join(dataset['name'] for dataset in config['datasets'])} every {interval} seconds (health: {health_path})")
+
+    health = {"pid": os.getpid(), "started_at": datetime.now(timezone.utc).isoformat(), "interval_seconds": interval, "status": "starting",
+              "polls": 0, "runs": 0, "failures": 0, "last_poll_at": None, "last_poll_seconds": None, "last_run": None,
+              "last_success_at": None, "source_versions": {}}
+    known_versions, values = {}, {}
+    try:
+        while True:
+            #2. Poll the source versions
+            poll_start = time.perf_counter()
+            versions = poll_source_versions(config)
+            health.update(polls=health["polls"] + 1, last_poll_at=datetime.now(timezone.utc).isoformat(),
+                          last_poll_seconds=round(time.perf_counter() - poll_start, 4))
+
+            # on the first poll the last recorded run decides, a process restart does not rerun an up to date pipeline
+            fingerprint = run_fingerprint(config, load_mode, sink_names, [versions[dataset["name"]] for dataset in config["datasets"]])
+            if not known_versions and is_unchanged_since_last_run(fingerprint, sink_names):
+                print("Outputs are up to date with the sources")
+                changed = []
+            elif not known_versions:
+                changed = [dataset["name"] for dataset in config["datasets"]]
+            else:
+                changed = changed_data_sets(known_versions, versions)
+
+            #3. Re-run what the changes affect, a failed run is retried on the next poll
+            if changed:
+                print(f"\nChange detected in: {', '.join(changed)}")
+                run_start, started_at = time.perf_counter(), datetime.now(timezone.utc).isoformat()
+                last_run = {"started_at": started_at, "changed_data_sets": changed}
+                try:
+                    values, last_run["nodes"] = refresh_data_sets(nodes, changed, values, stage_cache_directory_path, artifacts_directory_path)
+                    if fingerprint is not None:
+                        record_last_run(fingerprint, sink_names)
+                    last_run["status"] = "ok"
+                    health["last_success_at"] = datetime.now(timezone.utc).isoformat()
+                except (Exception, SystemExit) as e:
+                    print(f"Refresh failed, retrying on the next poll: {e}")
+                    last_run.update(status="failed", error=str(e))
+                    health["failures"] += 1
+                last_run.update(finished_at=datetime.now(timezone.utc).isoformat(), wall_seconds=round(time.perf_counter() - run_start, 4))
+                health.update(runs=health["runs"] + 1, last_run=last_run)
+            if health["last_run"] is None or health["last_run"]["status"] == "ok":
+                known_versions.update({name: version for name, version in versions.items() if version is not None})
+            health.update(status="ok" if health["last_run"] is None or health["last_run"]["status"] == "ok" else "failing",
+                          source_versions=versions)
+
+            if max_polls is not None and health["polls"] >= max_polls:
+                break
+            health["next_poll_at"] = datetime.fromtimestamp(time.time() + interval, timezone.utc).isoformat()
+            write_health(health, health_path)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nWatch mode interrupted")
+    finally:
+        stop_prefetch()
+        health.update(status="stopped", next_poll_at=None)
+        write_health(health, health_path)
+    return health
+
+# -----------------WATCH MODE-----------------#
+
+# -----------------CLI-----------------#
+
+cli_commands = {
+    "run": "run the whole pipeline (the default without a command), skipped when nothing changed since the last run",
+    "extract": "fetch and read the sources, outputs are stored for the transform command",
+    "transform": "transform, merge, validate and analyse the stored extracts",
+    "load": "write the stored transformed data set and analytics to the sinks",
+    "status": "show the last run, output tables and caches without running anything",
+    "watch": "keep running, poll the sources for new versions and refresh only what a change affects",
+    "rollback": "put a kept version of the output table, its summaries and analytics (the previous one by default) back in place of the live one; "
+                "the quarantine table is a log of every run and is not rolled back",
+}
+
+def add_stage_arguments(parser):
+    parser.add_argument("--config", default=None,
+                        help="JSON file listing the datasets to run (name, source, transform, optional member); "
+                             "a source is a Kaggle dataset, a local .zip/.csv path or an http(s) URL")
+    parser.add_argument("--load-mode", choices=["replace", "incremental", "swap"], default="replace",
+                        help="replace rewrites the output table, incremental upserts only changed years, "
+                             "swap builds and checks a new version next to the live table, renames it in and keeps earlier versions for rollback")
+    parser.add_argument("--sink", nargs="+", choices=sorted(output_sinks), default=["sqlite"],
+                        help="output sink(s) to write, sqlite is the default")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record tracemalloc peak memory per stage in the run report (slower, DAG nodes then run one at a time)")
+    parser.add_argument("--no-stage-cache", action="store_true",
+                        help="recompute every stage instead of reusing outputs cached under data/stage_cache")
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(description="Wages and employment ratio ETL pipeline")
+    subparsers = parser.add_subparsers(dest="command", metavar="{" + ",".join(cli_commands) + "}")
+    for command, help_text in cli_commands.items():
+        subparser = subparsers.add_parser(command, help=help_text, description=help_text)
+        if command == "status":
+            continue
+        if command == "rollback":
+            subparser.add_argument("--version", type=int, default=None,
+                                   help="version to put back (see `status`), defaults to the one before the live version")
+            continue
+        add_stage_arguments(subparser)
+        if command == "watch":
+            subparser.add_argument("--interval", type=float, default=watch_poll_seconds,
+                                   help=f"seconds between two polls of the source versions (default {watch_poll_seconds})")
+            subparser.add_argument("--max-polls", type=int, default=None,
+                                   help="stop after this many polls instead of running until interrupted")
+        if command != "run":
+            continue
+        subparser.add_argument("--chunksize", type=int, default=None,
+                               help="stream the two Kaggle datasets in chunks of this many rows into sqlite with a replace load "
+                                    "(out-of-core mode: no --config, stage cache, validation or versions)")
+        subparser.add_argument("--from", dest="from_node", default=None,
+                               help="start at this node, upstream outputs are read from the previous run")
+        subparser.add_argument("--until", dest="until_node", default=None,
+                               help="stop after this node")
+        subparser.add_argument("--dry-run", action="store_true",
+                               help="print the planned execution order without running anything")
+        subparser.add_argument("--force", action="store_true",
+                               help="run even when sources, code and outputs are unchanged since the last run")
+    return parser
+
+def cli(argv = None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # `pipeline.py [options]` keeps working as `pipeline.py run [options]`
+    if not argv or (argv[0] not in cli_commands and argv[0] not in ["-h", "--help"]):
+        argv = ["run"] + list(argv)
+    parser = build_cli_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(pipeline_status())
+        return
+    if args.command == "rollback":
+        rollback_published_version(args.version)
+        return
+    if args.command == "watch":
+        watch(config_path=args.config, interval=args.interval, load_mode=args.load_mode, sink_names=args.sink,
+              stage_cache=not args.no_stage_cache, max_polls=args.max_polls)
+        return
+    if args.command == "run":
+        conflicts = streaming_option_conflicts(args.load_mode, args.sink, args.config, args.from_node, args.until_node, args.dry_run)
+        if args.chunksize and conflicts:
+            parser.error(f"--chunksize can't be combined with {', '.join(conflicts)}")
+        main(load_mode=args.load_mode, sink_names=args.sink, trace_memory=args.trace_memory, chunksize=args.chunksize,
+             stage_cache=not args.no_stage_cache, config_path=args.config, from_node=args.from_node, until_node=args.until_node,
+             dry_run=args.dry_run, skip_unchanged=not args.force)
+    else:
+        main(load_mode=args.load_mode, sink_names=args.sink, trace_memory=args.trace_memory,
+             stage_cache=not args.no_stage_cache, config_path=args.config, stage=args.command)
+
+# -----------------CLI-----------------#
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,228 @@
+import os
+import sys
+import sqlite3
+import argparse
+import functools
+import pandas as pd
+
+import pipeline
+from pipeline import (
+    quote_identifier,
+    output_table_name,
+    output_database_name,
+    summary_periods,
+    summary_table_name,
+    table_columns,
+    analytics_tables,
+    dimension_columns,
+    wages_metric_spec,
+    employment_metric_spec,
+)
+
+# Read side of the output database: year slices, decade/rolling aggregates and gap series.
+# Aggregates come from the summary tables the load step builds, results are cached until the database changes.
+# A missing database or table raises LookupError, unknown columns, groups or metric kinds raise ValueError.
+
+# -----------------CONNECTION-----------------#
+
+# Results kept in the LRU cache, keyed by query and database version
+query_cache_size = 128
+
+metric_specs = {"wage": wages_metric_spec, "employment": employment_metric_spec}
+
+def default_db_path():
+    return os.path.join(pipeline.parent_directory, 'data', output_database_name)
+
+def database_version(db_path):
+    # WAL writes reach the main file only at checkpoints, so the -wal file is part of the version
+    version = []
+    for path in [db_path, db_path + "-wal"]:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+    if not version:
+        raise LookupError(f"Database {db_path} does not exist. Run the pipeline first...")
+    return tuple(version)
+
+def connect_read_only(db_path):
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+
+@functools.lru_cache(maxsize=query_cache_size)
+def cached_query(db_path, version, table_name, period, columns, start_year, end_year):
+
+    conn = connect_read_only(db_path)
+    try:
+        #1. Summary table when the load built one, otherwise the same aggregate over the full table
+        source_name = table_name if period is None else summary_table_name(table_name, period)
+        period_column = "year" if period in (None, "yearly") else period
+        available_columns = table_columns(conn, source_name)
+        if period is not None and not available_columns:
+            available_columns = table_columns(conn, table_name)
+            if not available_columns:
+                raise LookupError(f"Table {table_name} is missing from {db_path}. Run the pipeline first...")
+            metric_columns = [col for col in available_columns if col != "year" and col not in dimension_columns]
+            averages_sql = "".join(f", AVG({quote_identifier(col)}) AS {quote_identifier(col)}" for col in metric_columns)
+            source_sql = (f"(SELECT {summary_periods[period]} AS {quote_identifier(period_column)}, COUNT(*) AS row_count{averages_sql} "
+                          f"FROM {quote_identifier(table_name)} GROUP BY 1)")
+            available_columns = [period_column, "row_count"] + metric_columns
+        else:
+            source_sql = quote_identifier(source_name)
+        if not available_columns:
+            raise LookupError(f"Table {table_name} is missing from {db_path}. Run the pipeline first...")
+
+        #2. Only known column names reach the SQL text, years are bound as parameters
+        if columns is None:
+            columns = tuple(col for col in available_columns if col != period_column)
+        unknown_columns = [col for col in columns if col not in available_columns]
+        if unknown_columns:
+            raise ValueError(f"Unknown column(s) {', '.join(unknown_columns)} in {source_name}")
+        columns_sql = ", ".join(quote_identifier(col) for col in (period_column,) + tuple(col for col in columns if col != period_column))
+
+        conditions, parameters = [], []
+        if start_year is not None:
+            conditions.append(f"{quote_identifier(period_column)} >= ?")
+            parameters.append(start_year if period != "decade" else start_year // 10 * 10)
+        if end_year is not None:
+            conditions.append(f"{quote_identifier(period_column)} <= ?")
+            parameters.append(end_year)
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        df = pd.read_sql_query(f"SELECT {columns_sql} FROM {source_sql}{where_sql} ORDER BY {quote_identifier(period_column)}", conn, params=parameters)
+    finally:
+        conn.close()
+
+    #3. int16 years/decades, values stay as stored
+    return df.astype({col: "int16" for col in df.columns if col in ("year", "decade")})
+
+@functools.lru_cache(maxsize=query_cache_size)
+def cached_table(db_path, version, table_name):
+    conn = connect_read_only(db_path)
+    try:
+        if not table_columns(conn, table_name):
+            raise LookupError(f"Table {table_name} is missing from {db_path}. Run the pipeline first...")
+        return pd.read_sql_query(f"SELECT * FROM {quote_identifier(table_name)}", conn)
+    finally:
+        conn.close()
+
+def cached_result_copy(df):
+    # a caller editing the result must never touch the cached frame: under copy-on-write a shallow copy is enough,
+    # otherwise the caller gets its own buffers
+    return df.copy(deep=pd.options.mode.copy_on_write is not True)
+
+def run_query(table_name, period, columns, start_year, end_year, db_path):
+    if db_path is None:
+        db_path = default_db_path()
+    columns = None if columns is None else tuple([columns] if isinstance(columns, str) else columns)
+    df = cached_query(db_path, database_version(db_path), table_name, period, columns, start_year, end_year)
+    return cached_result_copy(df)
+
+def read_table(table_name, db_path):
+    if db_path is None:
+        db_path = default_db_path()
+    return cached_result_copy(cached_table(db_path, database_version(db_path), table_name))
+
+def clear_query_cache():
+    cached_query.cache_clear()
+    cached_table.cache_clear()
+
+# -----------------CONNECTION-----------------#
+
+# -----------------QUERIES-----------------#
+
+def year_range(start_year = None, end_year = None, columns = None, db_path = None, table_name = output_table_name):
+    # rows of the output table between two years (inclusive), served by the year index
+    return run_query(table_name, None, columns, start_year, end_year, db_path)
+
+def yearly_averages(columns = None, start_year = None, end_year = None, db_path = None, table_name = output_table_name):
+    return run_query(table_name, "yearly", columns, start_year, end_year, db_path)
+
+def decade_averages(columns = None, start_year = None, end_year = None, db_path = None, table_name = output_table_name):
+    return run_query(table_name, "decade", columns, start_year, end_year, db_path)
+
+def rolling_averages(columns, window = 5, start_year = None, end_year = None, db_path = None, table_name = output_table_name):
+
+    # trailing window over the yearly summary, the first window-1 years average what is available
+    yearly = yearly_averages(columns, None, end_year, db_path, table_name)
+    value_columns = [col for col in yearly.columns if col != "year"]
+    rolling = yearly[value_columns].rolling(window, min_periods=1).mean()
+    result = pd.concat([yearly[["year"]], rolling], axis=1)
+    if start_year is not None:
+        result = result[result["year"] >= start_year].reset_index(drop=True)
+    return result
+
+def gap_columns(first, second, kind = "wage"):
+
+    if kind not in metric_specs:
+        raise ValueError(f"Unknown metric kind '{kind}'. Use one of: {', '.join(metric_specs)}")
+    spec = metric_specs[kind]
+    if first not in spec["groups"] or second not in spec["groups"]:
+        raise ValueError(f"Unknown demographic group. Use two of: {', '.join(spec['groups'])}")
+
+    # gaps are stored for one ordering of each pair
+    pair = (first, second) if (first, second) in spec["comparisons"] else (second, first)
+    if pair not in spec["comparisons"]:
+        raise ValueError(f"No gap is computed between {first} and {second}. Available pairs: "
+                 f"{', '.join(f'{a}/{b}' for a, b in spec['comparisons'])}")
+    overrides = spec.get("column_overrides", {})
+    gap_column = spec["gap_column"].format(first=pair[0], second=pair[1])
+    gap_percent_column = spec["gap_percent_column"].format(first=pair[0], second=pair[1])
+    return overrides.get(gap_column, gap_column), overrides.get(gap_percent_column, gap_percent_column)
+
+def gap_series(first, second, kind = "wage", start_year = None, end_year = None, db_path = None, table_name = output_table_name):
+    # yearly absolute and percent gap between two demographic groups, columns: year, gap, gap_percent
+    gap_column, gap_percent_column = gap_columns(first, second, kind)
+    series = yearly_averages([gap_column, gap_percent_column], start_year, end_year, db_path, table_name)
+    return series.rename(columns={gap_column: "gap", gap_percent_column: "gap_percent"})
+
+# Results of the pipeline's analytics stage, read as stored
+
+def year_over_year_deltas(columns = None, start_year = None, end_year = None, db_path = None):
+    return run_query(analytics_tables["yoy_deltas"], None, columns, start_year, end_year, db_path)
+
+def metric_trends(columns = None, db_path = None):
+    # slope, intercept, r_squared and years per metric column
+    trends = read_table(analytics_tables["trends"], db_path)
+    if columns is not None:
+        trends = trends[trends["metric"].isin([columns] if isinstance(columns, str) else columns)].reset_index(drop=True)
+    return trends
+
+def gap_correlation_matrix(db_path = None):
+    return read_table(analytics_tables["gap_correlations"], db_path).set_index("metric")
+
+# -----------------QUERIES-----------------#
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the pipeline's output database")
+    parser.add_argument("query", choices=["years", "yearly", "decades", "rolling", "gap", "deltas", "trends", "correlations"])
+    parser.add_argument("--columns", nargs="+", default=None)
+    parser.add_argument("--start", type=int, default=None, help="first year (inclusive)")
+    parser.add_argument("--end", type=int, default=None, help="last year (inclusive)")
+    parser.add_argument("--window", type=int, default=5, help="rolling window in years")
+    parser.add_argument("--pair", nargs=2, metavar=("FIRST", "SECOND"), default=["White_Men", "Black_Men"],
+                        help="demographic groups of a gap series, e.g. White_Men Black_Men")
+    parser.add_argument("--kind", choices=list(metric_specs), default="wage")
+    parser.add_argument("--db", default=None, help="database path (defaults to data/wages_and_employment_data.db)")
+    args = parser.parse_args()
+
+    if args.query == "rolling" and not args.columns:
+        sys.exit("--columns is required for rolling averages")
+    try:
+        if args.query == "years":
+            result = year_range(args.start, args.end, args.columns, args.db)
+        elif args.query == "yearly":
+            result = yearly_averages(args.columns, args.start, args.end, args.db)
+        elif args.query == "decades":
+            result = decade_averages(args.columns, args.start, args.end, args.db)
+        elif args.query == "rolling":
+            result = rolling_averages(args.columns, args.window, args.start, args.end, args.db)
+        elif args.query == "gap":
+            result = gap_series(args.pair[0], args.pair[1], args.kind, args.start, args.end, args.db)
+        elif args.query == "deltas":
+            result = year_over_year_deltas(args.columns, args.start, args.end, args.db)
+        elif args.query == "trends":
+            result = metric_trends(args.columns, args.db)
+        else:
+            result = gap_correlation_matrix(args.db).reset_index()
+    except (LookupError, ValueError) as e:
+        sys.exit(str(e))
+    print(result.to_string(index=False))